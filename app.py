@@ -9,6 +9,16 @@ from io import BytesIO
 from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH 
 import time 
+import hashlib
+import logging
+import json
+import math
+import random
+import threading
+import contextvars
+import sqlite3
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 # ==========================================
 # [설정] 페이지 기본 설정
@@ -21,7 +31,7 @@ st.set_page_config(page_title="사계국어 모의고사 시스템", page_icon="
 try:
     GOOGLE_API_KEY = st.secrets["GOOGLE_API_KEY"]
     genai.configure(api_key=GOOGLE_API_KEY)
-except (KeyError, AttributeError):
+except Exception:  # secrets.toml 자체가 없는 환경(오프라인 벤치마크 등) 포함
     GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY", "")
     if GOOGLE_API_KEY:
         genai.configure(api_key=GOOGLE_API_KEY) 
@@ -42,6 +52,22 @@ MODEL_PRIORITY = [
           
 ] 
 
+# 로컬 저장소 경로 (지문 뱅크, 문제 은행 등)
+DATA_DIR = os.environ.get("EXAM_DATA_DIR", "exam_data")
+BANK_DB_PATH = os.path.join(DATA_DIR, "exam_bank.db")
+# 생성 결과(HTML/DOCX/섹션 JSON) 공용 저장소: 내용 해시 기준 1회 저장, 용량/기간 초과분 자동 정리
+ARTIFACT_DIR = os.path.join(DATA_DIR, "artifacts")
+ARTIFACT_MAX_BYTES = int(float(os.environ.get("EXAM_ARTIFACT_MAX_MB", "500")) * 1024 * 1024)
+ARTIFACT_MAX_AGE_DAYS = float(os.environ.get("EXAM_ARTIFACT_MAX_AGE_DAYS", "30"))
+RESULT_HISTORY_SIZE = 10
+
+# LLM 프로바이더 선택 ("live": OpenAI/Gemini 실제 호출, "mock": 네트워크 없는 모의 응답)
+LLM_PROVIDER_NAME = os.environ.get("EXAM_LLM_PROVIDER", "live")
+# 응답 기록(live) / 재생(mock)용 카세트 파일 (JSONL)
+LLM_CASSETTE_PATH = os.environ.get("EXAM_LLM_CASSETTE", "")
+
+logger = logging.getLogger("korean_exam_generator")
+
 # ==========================================
 # [초기화] Session State 설정
 # ==========================================
@@ -49,7 +75,10 @@ if 'generation_requested' not in st.session_state:
     st.session_state.generation_requested = False 
 
 if 'generated_result' not in st.session_state:
-    st.session_state.generated_result = None 
+    st.session_state.generated_result = None  # 생성 결과 본문은 아티팩트 저장소에 두고, 여기에는 참조(dict)만 보관
+
+if 'result_history' not in st.session_state:
+    st.session_state.result_history = []
 
 if 'app_mode' not in st.session_state:
     st.session_state.app_mode = "⚡ 비문학 문제 제작" 
@@ -165,6 +194,11 @@ HTML_HEAD = """
         }
         
         .type-box { margin-bottom: 30px; page-break-inside: avoid; }
+        .variant-title {
+            font-size: 1.3em; font-weight: 800; margin-top: 40px; margin-bottom: 10px;
+            border-left: 6px solid #000; padding-left: 12px;
+        }
+        .variant-title.next-set { page-break-before: always; }
         h3 { font-size: 1.2em; color: #000; border-bottom: 2px solid #000; padding-bottom: 5px; margin-bottom: 20px; font-weight: bold; margin-top: 40px; } 
 
         .question-box { margin-bottom: 20px; page-break-inside: avoid; }
@@ -322,33 +356,264 @@ def get_custom_header_html(main_title, topic_info):
     </div>
     """ 
 
+# ==========================================
+# [LLM 프로바이더] 실제 API / 오프라인 모의 응답 교체 가능 구조
+# ==========================================
+class LLMResponse:
+    """프로바이더 공통 응답. 기존 코드와 동일하게 .text 로 본문에 접근."""
+    def __init__(self, text, prompt_tokens=0, completion_tokens=0):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+class MockRateLimitError(Exception):
+    """모의 프로바이더가 발생시키는 429 (Too Many Requests)."""
+
+class CassetteMissError(Exception):
+    """엄격 재생 모드에서 카세트에 없는 프롬프트가 요청됨."""
+
+def estimate_tokens(text):
+    # 한글 위주 텍스트 기준 대략 2자당 1토큰 (모의 응답/카세트 재생 시 사용량 추정용)
+    return max(1, len(text) // 2)
+
+def prompt_cassette_key(prompt):
+    # 모델명은 키에 넣지 않음: 기록 시 대체 모델(gpt-4o 등)로 응답한 경우에도 재생되도록
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+def load_cassette(path):
+    entries = {}
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    entries[rec["key"]] = rec
+    return entries
+
+class LiveProvider:
+    """OpenAI / Google Gemini 실제 호출. cassette_path 지정 시 응답을 JSONL로 기록."""
+    name = "live"
+
+    def __init__(self, cassette_path=""):
+        self.cassette_path = cassette_path
+        self._lock = threading.Lock()
+
+    def supports(self, model_name):
+        if model_name.startswith("gpt") or model_name.startswith("o1"):
+            return openai_client is not None
+        return True
+
+    def generate(self, model_name, prompt, generation_config=None):
+        if model_name.startswith("gpt") or model_name.startswith("o1"):
+            response = openai_client.chat.completions.create(
+                model=model_name, 
+                messages=[
+                    {"role": "system", "content": "당신은 대한민국 수능 국어 출제 위원장입니다."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_completion_tokens=8192 if not generation_config else generation_config.max_output_tokens,
+                temperature=0.7 if not generation_config else generation_config.temperature
+            )
+            usage = getattr(response, "usage", None)
+            result = LLMResponse(response.choices[0].message.content,
+                                 getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0)
+        else:
+            model = genai.GenerativeModel(model_name)
+            response = model.generate_content(prompt, generation_config=generation_config)
+            usage = getattr(response, "usage_metadata", None)
+            result = LLMResponse(response.text,
+                                 getattr(usage, "prompt_token_count", 0) or 0, getattr(usage, "candidates_token_count", 0) or 0)
+        self._record_cassette(model_name, prompt, result)
+        return result
+
+    def stream(self, model_name, prompt, generation_config=None):
+        """응답 본문을 생성되는 대로 조각(str) 단위로 반환하는 제너레이터."""
+        parts = []
+        if model_name.startswith("gpt") or model_name.startswith("o1"):
+            response = openai_client.chat.completions.create(
+                model=model_name,
+                messages=[
+                    {"role": "system", "content": "당신은 대한민국 수능 국어 출제 위원장입니다."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_completion_tokens=8192 if not generation_config else generation_config.max_output_tokens,
+                temperature=0.7 if not generation_config else generation_config.temperature,
+                stream=True
+            )
+            for chunk in response:
+                piece = chunk.choices[0].delta.content if chunk.choices else None
+                if piece:
+                    parts.append(piece); yield piece
+        else:
+            model = genai.GenerativeModel(model_name)
+            for chunk in model.generate_content(prompt, generation_config=generation_config, stream=True):
+                if chunk.text:
+                    parts.append(chunk.text); yield chunk.text
+        text = "".join(parts)
+        self._record_cassette(model_name, prompt, LLMResponse(text, estimate_tokens(prompt), estimate_tokens(text)))
+
+    def _record_cassette(self, model_name, prompt, result):
+        if not self.cassette_path:
+            return
+        rec = {"key": prompt_cassette_key(prompt), "model": model_name, "text": result.text,
+               "prompt_tokens": result.prompt_tokens, "completion_tokens": result.completion_tokens}
+        with self._lock:
+            with open(self.cassette_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+class MockProvider:
+    """네트워크 없이 동작하는 모의 프로바이더.
+    카세트에 기록된 응답이 있으면 재생하고, 없으면 프롬프트 형태에 맞는 HTML을 합성 (strict_cassette=True면 CassetteMissError).
+    재생 적중/누락 횟수는 cassette_hits / cassette_misses에 집계.
+    지연 시간(로그정규분포 + 출력 토큰당 시간), 일반 실패율, 429 발생률을 설정해 부하/장애 상황을 재현."""
+    name = "mock"
+
+    def __init__(self, cassette_path="", latency_ms=800, latency_sigma=0.5, failure_rate=0.0, rate_limit_rate=0.0, ms_per_token=0.0, strict_cassette=False, seed=None):
+        self.cassette = load_cassette(cassette_path)
+        self.strict_cassette = strict_cassette
+        self.cassette_hits = 0
+        self.cassette_misses = 0
+        self.latency_ms = latency_ms
+        self.ms_per_token = ms_per_token  # 출력 길이에 비례하는 생성 시간 (실제 모델의 토큰 생성 속도 모사)
+        self.latency_sigma = latency_sigma
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def supports(self, model_name):
+        return True
+
+    def _draw(self):
+        with self._lock:
+            delay = self.latency_ms / 1000.0 * math.exp(self._rng.gauss(0, self.latency_sigma)) if self.latency_ms > 0 else 0
+            roll = self._rng.random()
+            salt = self._rng.randrange(1 << 30)
+        return delay, roll, salt
+
+    def _check_failure(self, model_name, roll):
+        if roll < self.rate_limit_rate:
+            raise MockRateLimitError(f"429 Too Many Requests (mock: {model_name})")
+        if roll < self.rate_limit_rate + self.failure_rate:
+            raise Exception(f"모의 응답 실패 (mock: {model_name})")
+
+    def _respond(self, model_name, prompt, salt):
+        rec = self.cassette.get(prompt_cassette_key(prompt))
+        with self._lock:
+            if rec:
+                self.cassette_hits += 1
+            else:
+                self.cassette_misses += 1
+        if rec:
+            return LLMResponse(rec["text"], rec.get("prompt_tokens") or estimate_tokens(prompt), rec.get("completion_tokens") or estimate_tokens(rec["text"]))
+        if self.strict_cassette:
+            raise CassetteMissError(f"카세트에 없는 프롬프트 (mock: {model_name}, key={prompt_cassette_key(prompt)[:12]})")
+        text = synthesize_mock_html(prompt, salt)
+        return LLMResponse(text, estimate_tokens(prompt), estimate_tokens(text))
+
+    def generate(self, model_name, prompt, generation_config=None):
+        delay, roll, salt = self._draw()
+        time.sleep(delay)
+        self._check_failure(model_name, roll)
+        result = self._respond(model_name, prompt, salt)
+        time.sleep(result.completion_tokens * self.ms_per_token / 1000.0)
+        return result
+
+    def stream(self, model_name, prompt, generation_config=None, pieces=20):
+        # 전체 지연의 1/10은 첫 토큰까지, 나머지는 조각마다 나누어 소비 (429/실패는 첫 조각 전에 발생)
+        delay, roll, salt = self._draw()
+        time.sleep(delay * 0.1)
+        self._check_failure(model_name, roll)
+        result = self._respond(model_name, prompt, salt)
+        text = result.text
+        step = max(1, -(-len(text) // pieces))
+        per_piece = (delay * 0.9 + result.completion_tokens * self.ms_per_token / 1000.0) / pieces
+        for i in range(0, len(text), step):
+            time.sleep(per_piece)
+            yield text[i:i + step]
+
+def synthesize_mock_html(prompt, salt=0):
+    """프롬프트 종류(지문/분석 차트/해설/문제지)를 구분해 실제 응답과 비슷한 구조의 HTML 생성."""
+    tag = f"{salt:08x}"
+    if "한 편만" in prompt:
+        paras = "".join(f"<p>모의 지문 {tag} 제{i}문단. 필자는 이 현상의 원인과 결과를 대조하며 논지를 전개한다.</p>" for i in range(1, 5))
+        return f"<div class='passage'>{paras}</div>"
+    if "analysis-chart" in prompt:
+        rows = "".join(f"<tr><th>{i}. 항목</th><td>1) 모의 분석 {tag}-{i}</td></tr>" for i in range(1, 7))
+        return f'<div class="analysis-title">운문 분석 (mock)</div><table class="analysis-chart">{rows}</table>'
+    if "해설" in prompt and ("[입력된 문제]" in prompt or "[입력 문제 내용]" in prompt or "문제 내용:" in prompt):
+        # 해설 분량은 요청된 문항 수에 비례 ("n번부터 m번까지" 지정이 있으면 그 범위, 없으면 포함된 문항 수)
+        rng = re.search(r'(\d+)번부터 (\d+)번까지', prompt)
+        count = int(rng.group(2)) - int(rng.group(1)) + 1 if rng else max(1, prompt.count("question-text"))
+        explain = "지문의 2문단과 4문단 내용을 종합하면 선지의 인과 관계가 뒤바뀌었음을 알 수 있다. " * 3
+        return "".join(f'<div class="ans-item"><span class="ans-num">{i}번 정답: ③</span><span class="ans-text">모의 해설 {tag}-{i}. {explain}</span></div>' for i in range(1, count + 1))
+    # 문제지: 요청된 "(n문항)" / "(n개)" 수만큼 문항 생성
+    parts = []; number = 1
+    for marker, title, cnt in re.findall(r'(<h3>|문항 \d+\. )([^<\n]+?)\s*\((\d+)(?:문항|개)\)', prompt):
+        if marker == "<h3>":  # 운문처럼 "문항 n." 목록으로만 요청한 경우 실제 응답과 같이 h3 없이 출력
+            parts.append(f"<h3>{title.strip()} ({cnt}문항)</h3>")
+        for _ in range(int(cnt)):
+            parts.append(f'<div class="question-box"><span class="question-text">{number}. 모의 문항 {tag}-{number}: 윗글의 내용과 일치하지 않는 것은?</span>'
+                         '<div class="choices"><div>① 가</div><div>② 나</div><div>③ 다</div><div>④ 라</div><div>⑤ 마</div></div></div><br><br>')
+            number += 1
+    return "".join(parts) or f'<div class="question-box"><span class="question-text">1. 모의 문항 {tag}</span></div>'
+
+def create_llm_provider():
+    if LLM_PROVIDER_NAME == "mock":
+        return MockProvider(
+            cassette_path=LLM_CASSETTE_PATH,
+            latency_ms=float(os.environ.get("EXAM_MOCK_LATENCY_MS", "800")),
+            latency_sigma=float(os.environ.get("EXAM_MOCK_LATENCY_SIGMA", "0.5")),
+            failure_rate=float(os.environ.get("EXAM_MOCK_FAILURE_RATE", "0")),
+            rate_limit_rate=float(os.environ.get("EXAM_MOCK_429_RATE", "0")),
+            ms_per_token=float(os.environ.get("EXAM_MOCK_MS_PER_TOKEN", "0")),
+            strict_cassette=os.environ.get("EXAM_MOCK_CASSETTE_STRICT", "") == "1",
+        )
+    return LiveProvider(cassette_path=LLM_CASSETTE_PATH)
+
+llm_provider = create_llm_provider()
+
+def set_llm_provider(provider):
+    global llm_provider
+    llm_provider = provider
+
+# 호출 횟수/토큰 집계 (벤치마크용). 스레드 풀에서는 contextvars.copy_context()로 전달
+_llm_usage = contextvars.ContextVar("llm_usage", default=None)
+_llm_usage_lock = threading.Lock()
+
+def start_llm_usage_tracking():
+    usage = {"calls": 0, "failures": 0, "rate_limited": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    _llm_usage.set(usage)
+    return usage
+
+def _record_llm_usage(response=None, error=None):
+    usage = _llm_usage.get()
+    if usage is None:
+        return
+    with _llm_usage_lock:
+        if error is None:
+            usage["calls"] += 1
+            usage["prompt_tokens"] += getattr(response, "prompt_tokens", 0)
+            usage["completion_tokens"] += getattr(response, "completion_tokens", 0)
+        else:
+            usage["failures"] += 1
+            if isinstance(error, MockRateLimitError) or "429" in str(error):
+                usage["rate_limited"] += 1
+
 def generate_content_with_fallback(prompt, generation_config=None, status_placeholder=None):
     last_exception = None
+    provider = llm_provider
     for model_name in MODEL_PRIORITY:
         try:
+            if not provider.supports(model_name):
+                continue
             if status_placeholder:
                 status_placeholder.info(f"⚡ 생성 중... (사용 모델: {model_name})")
-            if model_name.startswith("gpt") or model_name.startswith("o1"):
-                if not openai_client:
-                    continue
-                response = openai_client.chat.completions.create(
-                    model=model_name, 
-                    messages=[
-                        {"role": "system", "content": "당신은 대한민국 수능 국어 출제 위원장입니다."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_completion_tokens=8192 if not generation_config else generation_config.max_output_tokens,
-                    temperature=0.7 if not generation_config else generation_config.temperature
-                )
-                class OpenAIResponseWrapper:
-                    def __init__(self, text_content):
-                        self.text = text_content
-                return OpenAIResponseWrapper(response.choices[0].message.content)
-            else:
-                model = genai.GenerativeModel(model_name)
-                response = model.generate_content(prompt, generation_config=generation_config)
-                return response
+            response = provider.generate(model_name, prompt, generation_config)
+            _record_llm_usage(response)
+            return response
         except Exception as e:
+            _record_llm_usage(error=e)
             last_exception = e
             continue 
     if last_exception:
@@ -356,6 +621,129 @@ def generate_content_with_fallback(prompt, generation_config=None, status_placeh
     else:
         raise Exception("모델 응답 실패")
 
+def stream_content_with_fallback(prompt, generation_config=None, status_placeholder=None):
+    """generate_content_with_fallback의 스트리밍 버전. 첫 조각을 받기 전 실패한 경우에만 다음 모델로 넘어감."""
+    last_exception = None
+    provider = llm_provider
+    for model_name in MODEL_PRIORITY:
+        if not provider.supports(model_name):
+            continue
+        if status_placeholder:
+            status_placeholder.info(f"⚡ 생성 중... (사용 모델: {model_name}, 스트리밍)")
+        parts = []
+        try:
+            for piece in provider.stream(model_name, prompt, generation_config):
+                parts.append(piece)
+                yield piece
+        except Exception as e:
+            _record_llm_usage(error=e)
+            if parts:
+                raise  # 이미 일부를 내보낸 뒤에는 다른 모델로 이어 쓸 수 없음
+            last_exception = e
+            continue
+        text = "".join(parts)
+        # 스트리밍 응답은 사용량 메타데이터가 없을 수 있어 토큰 수는 추정치로 집계
+        _record_llm_usage(LLMResponse(text, estimate_tokens(prompt), estimate_tokens(text)))
+        return
+    if last_exception:
+        raise last_exception
+    else:
+        raise Exception("모델 응답 실패")
+
+# ==========================================
+# [해설 파이프라인] 문제지 스트리밍 중 완성된 문항 묶음부터 해설 요청
+# ==========================================
+ANSWER_GROUP_MAX_BOXES = 6  # 한 해설 요청에 담을 최대 문항(question-box) 수 (기존 해설 Batch Size와 동일)
+ANSWER_PIPELINE_WORKERS = 8  # 프로세스 전체 동시 해설 요청 상한 (세트 수·세션 수와 무관하게 429 위험을 제한)
+ANSWER_MAX_IN_FLIGHT_PER_REQUEST = 3  # 생성 1회(문제 세트 전체)가 공용 풀에 동시에 올릴 수 있는 해설 묶음 수 (다른 세션이 뒤에서 밀리지 않도록)
+
+def new_answer_slots():
+    """생성 1회 단위의 해설 동시 요청 제한. 같은 생성의 문제 세트들이 함께 공유."""
+    return threading.BoundedSemaphore(ANSWER_MAX_IN_FLIGHT_PER_REQUEST)
+
+@st.cache_resource
+def get_answer_executor():
+    # 모든 세션·문제 세트가 공유하는 해설 요청 풀 (Streamlit 재실행마다 새로 만들지 않도록 프로세스 공용 리소스로 보관)
+    return ThreadPoolExecutor(max_workers=ANSWER_PIPELINE_WORKERS)
+
+def split_complete_groups(text, final=False, max_boxes=ANSWER_GROUP_MAX_BOXES):
+    """스트리밍 중인 문제지에서 완성된 문항 묶음을 잘라냄. (묶음 HTML 목록, 소비한 길이) 반환.
+    묶음 경계: 다음 h3 시작 위치(유형 단위), 또는 닫힌 question-box가 max_boxes개 모인 지점. final이면 나머지 전체."""
+    groups = []; start = 0
+    while start < len(text):
+        seg = text[start:]
+        next_h3 = re.compile(r'<h3\b', re.IGNORECASE).search(seg, 1)
+        area = seg[:next_h3.start()] if next_h3 else seg
+        spans = _div_block_spans(area, "question-box")
+        if len(spans) >= max_boxes:
+            cut = spans[max_boxes - 1][1]
+        elif next_h3:
+            cut = next_h3.start()
+        elif final:
+            cut = len(seg)
+        else:
+            break
+        if len(normalize_question_text(seg[:cut])) >= 10:
+            groups.append(seg[:cut])
+        start += cut
+    return groups, start
+
+def stream_questions_with_answers(q_prompt, build_answer_prompt, status_placeholder=None, answer_slots=None):
+    """문제지를 스트리밍으로 받으면서 완성된 묶음마다 해설 요청을 병렬로 즉시 전송.
+    build_answer_prompt(묶음 HTML, 묶음 순번) → 해설 프롬프트. (문제지 원문, [묶음별 해설 HTML]) 반환.
+    answer_slots: 동시에 공용 풀에 올릴 묶음 수 제한(세마포어). 자리가 없으면 묶음은 대기 목록에 두고 스트림은 계속 읽음."""
+    buffer = ""; consumed = 0; futures = []; pending = []
+    executor = get_answer_executor()
+    slots = answer_slots or new_answer_slots()
+
+    def submit_pending(block=False):
+        while pending and slots.acquire(blocking=block):
+            idx, prompt = pending.pop(0)
+            future = executor.submit(contextvars.copy_context().run, generate_content_with_fallback, prompt)
+            future.add_done_callback(lambda _: slots.release())  # 취소된 경우에도 호출되어 자리 반환
+            futures[idx] = future
+
+    def dispatch(groups):
+        for group in groups:
+            group = re.sub(r'<h[12].*?>.*?</h[12]>', '', clean_llm_html(group), flags=re.DOTALL | re.IGNORECASE)
+            pending.append((len(futures), build_answer_prompt(group, len(futures))))
+            futures.append(None)
+        submit_pending()
+
+    try:
+        for piece in stream_content_with_fallback(q_prompt, status_placeholder=status_placeholder):
+            buffer += piece
+            submit_pending()
+            groups, used = split_complete_groups(buffer[consumed:])
+            consumed += used
+            if groups:
+                dispatch(groups)
+                if status_placeholder:
+                    status_placeholder.info(f"📝 문제 생성 중... (해설 {len(futures)}개 묶음 선요청)")
+        groups, used = split_complete_groups(buffer[consumed:], final=True)
+        dispatch(groups)
+        if status_placeholder:
+            status_placeholder.info(f"📝 남은 해설 생성 대기 중... (총 {len(futures)}개 묶음)")
+        answers = []
+        for idx in range(len(futures)):
+            while futures[idx] is None:
+                submit_pending(block=True)
+            answers.append(clean_llm_html(futures[idx].result().text))
+    except BaseException:
+        # 문제 스트림/해설 중 하나라도 실패하면 대기 중인 해설 요청은 취소하고, 실행 중인 요청을 기다리지 않고 바로 오류 전달
+        pending.clear()
+        for f in futures:
+            if f is not None:
+                f.cancel()
+        raise
+    return buffer, answers
+
+class NullStatus:
+    """UI 밖(벤치마크 등)에서 파이프라인을 실행할 때 st.empty() 대신 쓰는 진행 상태 객체."""
+    def info(self, *args, **kwargs):
+        pass
+    success = warning = error = info
+
 def create_docx(html_content, file_name, main_title, topic_title):
     document = Document()
     style = document.styles['Normal']
@@ -374,7 +762,737 @@ def create_docx(html_content, file_name, main_title, topic_title):
     file_stream = BytesIO()
     document.save(file_stream)
     file_stream.seek(0)
-    return file_stream 
+    return file_stream
+
+def clean_llm_html(text):
+    return text.replace("```html", "").replace("```", "").strip()
+
+# ==========================================
+# [아티팩트 저장소] 생성 결과를 내용 해시(sha256) 기준으로 디스크에 1회 저장
+# ==========================================
+ARTIFACT_CLEANUP_INTERVAL_SECONDS = 600
+
+@st.cache_resource
+def get_artifact_cleanup_state():
+    # 모듈 전역은 Streamlit 재실행마다 초기화되므로, 마지막 정리 시각은 프로세스 공용 리소스에 보관
+    return {"lock": threading.Lock(), "last_run": 0.0}
+
+def artifact_path(digest, ext):
+    return os.path.join(ARTIFACT_DIR, digest[:2], f"{digest}.{ext}")
+
+def artifact_exists(digest, ext):
+    return os.path.exists(artifact_path(digest, ext))
+
+def put_artifact(data, ext):
+    """bytes를 저장하고 sha256 해시를 반환. 같은 내용은 한 번만 저장(수정 시각만 갱신)."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = artifact_path(digest, ext)
+    if os.path.exists(path):
+        try:
+            os.utime(path)
+            return digest
+        except FileNotFoundError:
+            pass  # 확인 직후 다른 세션의 정리 작업으로 삭제됨 → 다시 저장
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)  # 동시 저장 시에도 완성된 파일만 보이도록 원자적 교체
+    return digest
+
+def read_artifact(digest, ext):
+    with open(artifact_path(digest, ext), "rb") as f:
+        return f.read()
+
+def artifact_download(digest, ext):
+    """다운로드 버튼용 지연 로더: 클릭 시점에만 파일을 읽어 세션 메모리에 사본을 남기지 않음.
+    화면 표시 후 정리 작업으로 삭제된 경우 FileNotFoundError → 빈 파일 대신 다운로드 실패로 처리되고,
+    클릭으로 인한 재실행에서 display_results가 정리 안내를 표시."""
+    return lambda: read_artifact(digest, ext)
+
+def cleanup_artifacts(max_bytes=None, max_age_days=None):
+    """보관 기간이 지난 파일을 지우고, 총 용량이 한도를 넘으면 오래된 파일부터 삭제. 삭제 개수 반환."""
+    max_bytes = ARTIFACT_MAX_BYTES if max_bytes is None else max_bytes
+    max_age_days = ARTIFACT_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    if not os.path.isdir(ARTIFACT_DIR):
+        return 0
+    files = []
+    for sub in os.scandir(ARTIFACT_DIR):
+        if sub.is_dir():
+            for entry in os.scandir(sub.path):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()
+    cutoff = time.time() - max_age_days * 86400
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for mtime, size, path in files:
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    return removed
+
+def save_exam_artifacts(result):
+    """생성 결과를 HTML/DOCX/섹션 JSON으로 저장하고 세션에 보관할 참조(dict)를 반환."""
+    html_bytes = result["full_html"].encode("utf-8")
+    docx_bytes = create_docx(result["full_html"], "exam.docx", result["main_title"], result["topic_title"]).getvalue()
+    sections_bytes = json.dumps(result.get("sections", {}), ensure_ascii=False).encode("utf-8")
+    ref = {
+        "html": put_artifact(html_bytes, "html"),
+        "docx": put_artifact(docx_bytes, "docx"),
+        "sections": put_artifact(sections_bytes, "json"),
+        "main_title": result["main_title"],
+        "topic_title": result["topic_title"],
+        "created_at": time.time(),
+    }
+    # 정리 작업은 프로세스 전체에서 10분에 한 번만 실행 (실행 여부만 잠금으로 결정하고 정리 자체는 잠금 밖에서)
+    state = get_artifact_cleanup_state()
+    with state["lock"]:
+        due = time.time() - state["last_run"] > ARTIFACT_CLEANUP_INTERVAL_SECONDS
+        if due:
+            state["last_run"] = time.time()
+    if due:
+        cleanup_artifacts()
+    return ref
+
+def publish_generated_result(result):
+    ref = save_exam_artifacts(result)
+    st.session_state.generated_result = ref
+    st.session_state.result_history = ([ref] + st.session_state.result_history)[:RESULT_HISTORY_SIZE]
+    st.session_state.pop("history_select", None)  # 기록 선택 상자를 새 결과로 초기화
+
+def result_artifacts_exist(ref):
+    return artifact_exists(ref["html"], "html") and artifact_exists(ref["docx"], "docx")
+
+# ==========================================
+# [지문 뱅크] 주제/영역/난이도별 생성 지문 로컬 저장
+# ==========================================
+SUMMARY_BLANK_HTML = "<div class='summary-blank'>📝 문단 요약 연습: (이곳에 핵심 내용을 요약해보세요)</div>"
+
+def get_bank_connection():
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(BANK_DB_PATH, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS passages (
+            passage_key TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            html TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_passages_key ON passages (passage_key, created_at)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mode TEXT NOT NULL,
+            passage_key TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            genre TEXT NOT NULL,
+            q_type TEXT NOT NULL,
+            html TEXT NOT NULL,
+            norm_text TEXT NOT NULL,
+            served_count INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_passage ON questions (passage_key, q_type, served_count)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_topic ON questions (mode, topic, q_type)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_domain ON questions (mode, domain, q_type)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_genre ON questions (mode, genre, q_type)")
+    conn.execute("CREATE TABLE IF NOT EXISTS question_bands (band_hash INTEGER NOT NULL, question_id INTEGER NOT NULL)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_question_bands ON question_bands (band_hash)")
+    return conn
+
+def make_passage_key(topic, domain, difficulty):
+    raw = "|".join([topic.strip(), domain.strip(), difficulty.strip()])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def load_passage(topic, domain, difficulty):
+    """지문 뱅크에서 (주제, 영역, 난이도)에 해당하는 가장 최근 지문을 반환. 없으면 None."""
+    conn = get_bank_connection()
+    try:
+        row = conn.execute(
+            "SELECT html FROM passages WHERE passage_key = ? ORDER BY created_at DESC LIMIT 1",
+            (make_passage_key(topic, domain, difficulty),)
+        ).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+def save_passage(topic, domain, difficulty, html):
+    conn = get_bank_connection()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO passages (passage_key, topic, domain, difficulty, html, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (make_passage_key(topic, domain, difficulty), topic, domain, difficulty, html, time.time())
+            )
+    finally:
+        conn.close()
+
+def generate_passage(topic, domain, difficulty, status_placeholder=None, save=True):
+    """[1단계] 지문만 생성하여 지문 뱅크에 저장. 문제 출제는 저장된 지문을 기반으로 별도 진행.
+    save=False: 저장하지 않고 반환만 (미리 생성한 지문은 실제로 사용될 때 저장)."""
+    domain_line = "" if domain == "주제 통합" else f", 영역: {domain}"
+    p_passage = """
+당신은 대한민국 수능 국어 출제 위원장입니다.
+아래 조건에 맞는 수능 비문학 지문 **한 편만** HTML로 작성하시오. 문제는 출제하지 마시오.
+- `<html>`, `<head>` 생략. h1, h2 태그 및 제목 노출 금지.
+- 주제: {TOPIC}{DOMAIN}, 난이도: {DIFF}, 길이: 1800자 내외.
+- 주제가 (가), (나)로 나뉘어 있으면 (가), (나) 두 지문을 각각 작성하고 각 지문 앞에 [가], [나]를 표시하시오.
+- 전체를 반드시 `<div class='passage'>` 태그로 감싸고, 각 문단은 `<p>` 태그로 구분하시오.
+    """.format(TOPIC=topic, DOMAIN=domain_line, DIFF=difficulty)
+    res_p = generate_content_with_fallback(p_passage, status_placeholder=status_placeholder)
+    html_p = clean_llm_html(res_p.text)
+    html_p = re.sub(r'<h[12].*?>.*?</h[12]>', '', html_p, flags=re.DOTALL | re.IGNORECASE)
+    if save:
+        save_passage(topic, domain, difficulty, html_p)
+    return html_p
+
+def get_or_create_passage(topic, domain, difficulty, reuse=True, status_placeholder=None, speculative_owner=None):
+    """저장된 지문이 있으면 재사용(LLM 호출 없음), 없으면 새로 생성. (지문 HTML, 재사용 여부) 반환.
+    speculative_owner(미리 생성을 켠 세션 식별자)가 주어지고 그 세션이 미리 생성한 지문이 있으면 재사용 설정과 관계없이 새 지문으로 사용."""
+    if speculative_owner:
+        speculative = take_speculative_passage(topic, domain, difficulty, speculative_owner, status_placeholder=status_placeholder)
+        if speculative:
+            return speculative, False
+    if reuse:
+        cached = load_passage(topic, domain, difficulty)
+        if cached:
+            return cached, True
+    return generate_passage(topic, domain, difficulty, status_placeholder=status_placeholder), False
+
+# ==========================================
+# [지문 미리 생성] 설정 입력 중 주제가 안정되면 지문을 백그라운드에서 미리 생성
+# - (주제, 영역, 난이도)가 SPECULATIVE_STABLE_SECONDS 동안 바뀌지 않으면 시작
+# - 입력이 바뀌면 취소 (대기 중이면 호출 자체를 취소, 실행 중이면 결과 폐기)
+# - 사용되지 못한 호출이 세션당 SPECULATIVE_MAX_WASTED회를 넘으면 중단
+# ==========================================
+SPECULATIVE_STABLE_SECONDS = 3
+SPECULATIVE_MAX_WASTED = 3
+SPECULATIVE_WORKERS = 2
+SPECULATIVE_TTL_SECONDS = 600  # 끝내 사용되지 않은(탭 이동 등) 작업 정리 기준
+
+@st.cache_resource
+def get_speculative_registry():
+    # Streamlit은 상호작용마다 스크립트를 재실행하므로, 진행 중 작업은 프로세스 공용 리소스에 보관
+    return {"lock": threading.Lock(), "jobs": {}, "executor": ThreadPoolExecutor(max_workers=SPECULATIVE_WORKERS)}
+
+def _speculative_passage_worker(job):
+    job["started"] = True
+    if job["cancel"].is_set():
+        return None
+    html_p = generate_passage(job["topic"], job["domain"], job["difficulty"], save=False)
+    return None if job["cancel"].is_set() else html_p
+
+def start_speculative_passage(topic, domain, difficulty, owner):
+    """(주제, 영역, 난이도) 지문 미리 생성 시작. 같은 키의 작업이 이미 있으면 owner만 추가 (세션 간 중복 호출 방지)."""
+    registry = get_speculative_registry()
+    key = make_passage_key(topic, domain, difficulty)
+    now = time.time()
+    with registry["lock"]:
+        for stale_key in [k for k, j in registry["jobs"].items() if now - j["created_at"] > SPECULATIVE_TTL_SECONDS and j["future"].done()]:
+            del registry["jobs"][stale_key]
+        job = registry["jobs"].get(key)
+        if job is None:
+            job = {"topic": topic, "domain": domain, "difficulty": difficulty, "owners": set(),
+                   "cancel": threading.Event(), "started": False, "created_at": now}
+            job["future"] = registry["executor"].submit(contextvars.copy_context().run, _speculative_passage_worker, job)
+            registry["jobs"][key] = job
+        job["owners"].add(owner)
+    return key
+
+def cancel_speculative_passage(key, owner):
+    """owner의 미리 생성 작업 취소. 남은 owner가 없으면 작업 자체를 취소하고, 이미 LLM을 호출했다면 True(낭비된 호출) 반환."""
+    registry = get_speculative_registry()
+    with registry["lock"]:
+        job = registry["jobs"].get(key)
+        if job is None or owner not in job["owners"]:
+            return False
+        job["owners"].discard(owner)
+        if job["owners"]:
+            return False
+        del registry["jobs"][key]
+        job["cancel"].set()
+        return not job["future"].cancel() and job["started"]
+
+def speculative_passage_state(key):
+    """'running' / 'ready' / 'failed' / None(작업 없음)"""
+    job = get_speculative_registry()["jobs"].get(key)
+    if job is None:
+        return None
+    if not job["future"].done():
+        return "running"
+    return "ready" if job["future"].exception() is None and job["future"].result() else "failed"
+
+def take_speculative_passage(topic, domain, difficulty, owner, status_placeholder=None):
+    """owner가 요청한 미리 생성 지문을 꺼내 지문 뱅크에 저장 후 반환 (실행 중이면 완료까지 대기).
+    owner의 작업이 없거나, 아직 시작 전이거나, 실패 시 None. 다른 세션도 기다리는 작업이면 그 세션 몫으로 남겨 둠."""
+    registry = get_speculative_registry()
+    key = make_passage_key(topic, domain, difficulty)
+    with registry["lock"]:
+        job = registry["jobs"].get(key)
+        if job is None or owner not in job["owners"]:
+            return None
+        job["owners"].discard(owner)
+        if job["owners"]:
+            if not job["future"].running() and not job["future"].done():
+                return None  # 대기 중인 공유 작업은 다른 세션 몫으로 두고 바로 직접 생성
+        else:
+            del registry["jobs"][key]
+            if job["future"].cancel():
+                return None  # 아직 대기열에 있으면 다른 세션 작업 뒤에서 기다리지 않고 바로 직접 생성
+    if status_placeholder and not job["future"].done():
+        status_placeholder.info("🔮 미리 생성 중인 지문을 마무리하는 중...")
+    try:
+        html_p = job["future"].result()
+    except Exception:
+        return None  # 미리 생성 실패 시 일반 생성 경로로 진행
+    if html_p:
+        with registry["lock"]:
+            first_taker = not job.get("saved"); job["saved"] = True  # 공유 작업은 먼저 꺼낸 세션만 저장
+        if first_taker:
+            save_passage(topic, domain, difficulty, html_p)
+        if status_placeholder:
+            status_placeholder.info("🔮 미리 생성된 지문을 사용합니다.")
+    return html_p
+
+def update_speculative_inputs(topic, domain, difficulty, enabled):
+    """사이드바 재실행마다 호출: 입력이 바뀌면 변경 시각을 기록하고 이전 미리 생성 작업을 취소."""
+    if "spec_owner" not in st.session_state:
+        st.session_state.spec_owner = os.urandom(8).hex()
+        st.session_state.spec_wasted = 0
+    inputs = (topic, domain, difficulty) if enabled else None
+    if st.session_state.get("spec_inputs") == inputs:
+        return
+    st.session_state.spec_inputs = inputs
+    st.session_state.spec_changed_at = time.time()
+    job_key = st.session_state.pop("spec_job_key", None)
+    if job_key and cancel_speculative_passage(job_key, st.session_state.spec_owner):
+        st.session_state.spec_wasted += 1
+
+@st.fragment(run_every=1)
+def speculative_passage_watcher():
+    """1초마다 재실행되는 조각: 입력이 충분히 안정되면 미리 생성을 시작하고 진행 상태를 표시."""
+    inputs = st.session_state.get("spec_inputs")
+    if not inputs or st.session_state.generation_requested:
+        return
+    key = make_passage_key(*inputs)
+    if st.session_state.get("spec_job_key") != key:
+        if st.session_state.spec_wasted >= SPECULATIVE_MAX_WASTED:
+            st.caption(f"🔮 미리 생성 중단 (사용되지 않은 생성 {SPECULATIVE_MAX_WASTED}회 초과)")
+            return
+        if time.time() - st.session_state.spec_changed_at < SPECULATIVE_STABLE_SECONDS:
+            return
+        if st.session_state.get("nf_reuse_p", False):
+            # 재사용할 저장 지문이 이미 있으면 미리 생성 불필요 (매초 DB를 열지 않도록 입력별 확인 결과를 보관)
+            if st.session_state.get("spec_bank_checked") != key:
+                st.session_state.spec_bank_checked = key
+                st.session_state.spec_in_bank = load_passage(*inputs) is not None
+            if st.session_state.spec_in_bank:
+                return
+        st.session_state.spec_job_key = start_speculative_passage(*inputs, st.session_state.spec_owner)
+    state = speculative_passage_state(key)
+    if state == "running":
+        st.caption("🔮 지문 미리 생성 중...")
+    elif state == "ready":
+        st.caption("🔮 지문 준비 완료 — 생성 시 문제·해설만 만듭니다.")
+    elif state == "failed":
+        st.caption("🔮 미리 생성 실패 — 생성 시 다시 시도합니다.")
+
+def passage_html_to_text(html_p):
+    # 문단 구분(엔터 두번)을 유지한 채 태그 제거 → 직접 입력 지문과 동일한 형태로 문제 출제에 사용
+    text = re.sub(r'</p\s*>', '\n\n', html_p, flags=re.IGNORECASE)
+    text = re.sub(r'<br\s*/?>', '\n', text, flags=re.IGNORECASE)
+    text = re.sub(r'<[^>]+>', '', text)
+    return re.sub(r'\n\s*\n+', '\n\n', text).strip()
+
+def add_summary_blanks(html_p):
+    return re.sub(r'(</p\s*>)', r'\1' + SUMMARY_BLANK_HTML, html_p, flags=re.IGNORECASE)
+
+# ==========================================
+# [문제 은행] 생성 문항 분할 저장 + 유사 문항(MinHash/LSH) 중복 제거
+# ==========================================
+# 한글은 띄어쓰기/조사 변형이 잦아 음절 3-gram 슁글이 유사도 판정에 적합
+SHINGLE_SIZE = 3
+MINHASH_PERM = 64
+MINHASH_BANDS = 16  # 밴드당 4행 → 자카드 0.7 이상이면 높은 확률로 후보 검출
+QUESTION_DUP_THRESHOLD = 0.7
+_MINHASH_PRIME = (1 << 61) - 1
+_minhash_rng = random.Random(20240301)
+MINHASH_PARAMS = [(_minhash_rng.randrange(1, _MINHASH_PRIME), _minhash_rng.randrange(0, _MINHASH_PRIME)) for _ in range(MINHASH_PERM)]
+
+def normalize_question_text(html_item):
+    text = re.sub(r'<[^>]+>', ' ', html_item)
+    text = re.sub(r'&[a-zA-Z#0-9]+;', ' ', text)
+    text = re.sub(r'^\s*\[?\d+\]?[.)]?\s*', '', text)  # 문항 번호 제거
+    return re.sub(r'[^0-9A-Za-z가-힣①-⑤]', '', text)
+
+def make_shingles(norm_text):
+    if len(norm_text) <= SHINGLE_SIZE:
+        return {norm_text}
+    return {norm_text[i:i + SHINGLE_SIZE] for i in range(len(norm_text) - SHINGLE_SIZE + 1)}
+
+def minhash_band_hashes(shingles):
+    hashed = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    signature = [min((a * h + b) % _MINHASH_PRIME for h in hashed) for a, b in MINHASH_PARAMS]
+    rows = MINHASH_PERM // MINHASH_BANDS
+    band_hashes = []
+    for band in range(MINHASH_BANDS):
+        chunk = ",".join(str(v) for v in signature[band * rows:(band + 1) * rows])
+        # 밴드 번호를 상위 비트에 두어 서로 다른 밴드끼리 충돌하지 않도록 함
+        band_hashes.append((band << 32) | zlib.crc32(chunk.encode("utf-8")))
+    return band_hashes
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def _div_block_spans(html, class_name):
+    # question-box 내부에 choices 등 div가 중첩되므로 여닫는 태그 깊이를 세어 닫힌 블록의 (시작, 끝) 위치를 반환
+    spans = []
+    pattern = re.compile(r'<div[^>]*class=["\'][^"\']*\b' + class_name + r'\b[^"\']*["\'][^>]*>', re.IGNORECASE)
+    pos = 0
+    while True:
+        m = pattern.search(html, pos)
+        if not m:
+            break
+        depth = 0; end = None
+        for tag in re.finditer(r'<(/?)div\b[^>]*>', html[m.start():], re.IGNORECASE):
+            depth += -1 if tag.group(1) else 1
+            if depth == 0:
+                end = m.start() + tag.end(); break
+        if end is None:
+            break
+        spans.append((m.start(), end)); pos = end
+    return spans
+
+def _extract_div_blocks(html, class_name):
+    return [html[start:end] for start, end in _div_block_spans(html, class_name)]
+
+def split_question_items(html_q, lead_type=""):
+    """문제지 HTML을 (문항 유형, 문항 HTML) 목록으로 분할. 유형은 h3 제목에서 '(n문항)' 이하를 제거한 값.
+    첫 h3 이전(운문처럼 h3 없이 출력되는 문제지 포함) 문항의 유형은 lead_type. None이면 해당 부분을 제외."""
+    items = []
+    parts = re.split(r'<h3[^>]*>(.*?)</h3>', html_q, flags=re.DOTALL | re.IGNORECASE)
+    # parts: [h3 이전 내용, 제목1, 내용1, 제목2, 내용2, ...]
+    sections = [(parts[i], parts[i + 1]) for i in range(1, len(parts) - 1, 2)]
+    if lead_type is not None:
+        sections.insert(0, (lead_type, parts[0]))
+    for title, body in sections:
+        q_type = re.sub(r'<[^>]+>', '', title)
+        q_type = re.sub(r'\s*\(\d+\s*(문항|개)\).*$', '', q_type, flags=re.DOTALL).strip()
+        boxes = _extract_div_blocks(body, "question-box")
+        if not boxes:
+            # O/X, 빈칸 등 question-box 없이 <br><br>로 구분된 문항
+            boxes = [seg.strip() for seg in re.split(r'(?:<br\s*/?>\s*){2,}', body, flags=re.IGNORECASE)]
+        for box in boxes:
+            if len(normalize_question_text(box)) >= 10:
+                items.append((q_type, box))
+    return items
+
+def find_near_duplicates(conn, mode, passage_key, norm_text, shingles=None, band_hashes=None):
+    # 같은 지문 안에서만 비교: 다른 지문의 유사 문항(단어 하나로 정오가 바뀌는 O/X 등)을 대신 출제하지 않도록
+    shingles = shingles or make_shingles(norm_text)
+    band_hashes = band_hashes or minhash_band_hashes(shingles)
+    placeholders = ",".join("?" * len(band_hashes))
+    candidate_rows = conn.execute(
+        f"SELECT DISTINCT q.id, q.norm_text FROM question_bands b JOIN questions q ON q.id = b.question_id "
+        f"WHERE b.band_hash IN ({placeholders}) AND q.mode = ? AND q.passage_key = ?",
+        band_hashes + [mode, passage_key]
+    ).fetchall()
+    return [qid for qid, cand_text in candidate_rows if jaccard(shingles, make_shingles(cand_text)) >= QUESTION_DUP_THRESHOLD]
+
+def index_generated_questions(html_q, mode, passage_key, topic="", domain="", genre="", lead_type=""):
+    """생성된 문제지를 문항 단위로 분할하여 문제 은행에 저장. 같은 지문의 기존 문항과 유사한 문항은 건너뜀. 저장 개수 반환.
+    저장은 부가 기능이므로 DB 오류(잠김, 읽기 전용 등)는 기록만 하고 생성 결과에는 영향을 주지 않음."""
+    added = 0
+    try:
+        conn = get_bank_connection()
+    except (sqlite3.Error, OSError):
+        logger.exception("문제 은행 저장 실패 (연결)")
+        return 0
+    try:
+        with conn:
+            for q_type, item_html in split_question_items(html_q, lead_type=lead_type):
+                norm_text = normalize_question_text(item_html)
+                shingles = make_shingles(norm_text)
+                band_hashes = minhash_band_hashes(shingles)
+                if find_near_duplicates(conn, mode, passage_key, norm_text, shingles, band_hashes):
+                    continue
+                cur = conn.execute(
+                    "INSERT INTO questions (mode, passage_key, topic, domain, genre, q_type, html, norm_text, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (mode, passage_key, topic, domain, genre, q_type, item_html, norm_text, time.time())
+                )
+                conn.executemany("INSERT INTO question_bands (band_hash, question_id) VALUES (?, ?)", [(h, cur.lastrowid) for h in band_hashes])
+                added += 1
+    except sqlite3.Error:
+        logger.exception("문제 은행 저장 실패")
+        return 0
+    finally:
+        conn.close()
+    return added
+
+def lookup_questions(mode, q_type=None, passage_key=None, topic=None, domain=None, genre=None, limit=20):
+    """조건에 맞는 저장 문항을 덜 사용된 순서로 반환. [(id, q_type, html), ...]"""
+    where = ["mode = ?"]; params = [mode]
+    for col, val in (("q_type", q_type), ("passage_key", passage_key), ("topic", topic), ("domain", domain), ("genre", genre)):
+        if val is not None:
+            where.append(f"{col} = ?"); params.append(val)
+    conn = get_bank_connection()
+    try:
+        return conn.execute(
+            "SELECT id, q_type, html FROM questions WHERE " + " AND ".join(where) + " ORDER BY served_count, RANDOM() LIMIT ?",
+            params + [limit]
+        ).fetchall()
+    finally:
+        conn.close()
+
+def mark_questions_served(question_ids):
+    conn = get_bank_connection()
+    try:
+        with conn:
+            conn.executemany("UPDATE questions SET served_count = served_count + 1 WHERE id = ?", [(qid,) for qid in question_ids])
+    finally:
+        conn.close()
+
+def renumber_question_item(item_html, number):
+    return re.sub(r'^((?:\s|<[^>]+>)*)\[?\d+\]?[.)]', lambda m: m.group(1) + f"{number}.", item_html, count=1)
+
+def build_sheet_from_bank(mode, passage_key, type_specs, lead_html="", start_number=1):
+    """type_specs [(유형 제목, 문항 수), ...]를 모두 채울 수 있으면 저장 문항으로 문제지를 조립(LLM 호출 없음). 부족하면 None."""
+    picked = []
+    for title, count in type_specs:
+        rows = lookup_questions(mode, q_type=title, passage_key=passage_key, limit=count * 3)
+        chosen = []; chosen_shingles = []
+        for qid, _, item_html in rows:
+            # 같은 세트 안에서도 서로 유사한 문항은 함께 싣지 않음
+            shingles = make_shingles(normalize_question_text(item_html))
+            if any(jaccard(shingles, s) >= QUESTION_DUP_THRESHOLD for s in chosen_shingles):
+                continue
+            chosen.append((qid, item_html)); chosen_shingles.append(shingles)
+            if len(chosen) == count:
+                break
+        if len(chosen) < count:
+            return None
+        picked.append((title, chosen))
+
+    html_parts = [lead_html]; number = start_number; served_ids = []
+    for title, chosen in picked:
+        html_parts.append(f'<h3>{title} ({len(chosen)}문항)</h3>')
+        for qid, item_html in chosen:
+            html_parts.append(renumber_question_item(item_html, number) + '<br><br>')
+            number += 1; served_ids.append(qid)
+    mark_questions_served(served_ids)
+    return "".join(html_parts)
+
+# ==========================================
+# [비문학 2단계] 저장된 지문 기반 문제 + 해설 생성
+# ==========================================
+def generate_nf_question_set(passage_text, reqs_str, bg_instruction, total_q_cnt, use_summary, status_placeholder=None, html_q=None, pipelined=False, answer_slots=None):
+    """지문 원문을 입력받아 문제지(html_q)와 정답 및 해설(html_answers)을 생성. 세트별 병렬 실행 가능.
+    html_q가 주어지면(문제 은행에서 조립한 문제지) 문제 출제 호출을 건너뛰고 해설만 생성.
+    pipelined이면 문제지를 스트리밍으로 받으며 완성된 문항 묶음의 해설을 동시에 생성."""
+    # [원본 유지] 킬러 가이드
+    p1_prompt = """
+당신은 대한민국 수능 국어 출제 위원장입니다.
+아래 지시사항에 맞춰 완벽한 HTML 포맷의 모의고사 문제지를 생성하시오.
+- `<html>`, `<head>` 생략, `<body>` 내용만 출력.
+- 정답 및 해설 제외. 학생용 문제지.
+# 🚨 [매우 중요] 출력 시 절대 제목/헤더를 생성하지 마시오. h1, h2 태그 및 제목 노출 금지.
+
+{STEP1}
+{USER_BLOCK}
+{BG_PROM}
+
+# ----------------------------------------------------------------
+# 🚨 [고난도(킬러 문항) 출제 필수 가이드라인]
+# ----------------------------------------------------------------
+1. **[정보의 재구성 필수 - 1:1 매칭 금지]**:
+   - 정답 선지는 절대 한 문단이나 한 문장의 내용만으로 판단할 수 없게 하시오.
+   - **반드시 '1문단 + 3문단' 혹은 'A주장 + B반론'처럼 서로 멀리 떨어진 두 개 이상의 정보를 결합**해야만 참/거짓을 판별할 수 있도록 문장을 재구성하시오.
+
+2. **[단어 바꿔치기(Paraphrasing)]**:
+   - 지문에 있는 단어를 그대로 선지에 쓰지 마시오.
+   - 지문의 '상승했다'를 '하락하지 않았다'나 '고점에 도달했다'처럼 **동의어나 함축적 의미로 변환**하여 선지를 작성하시오.
+
+3. **[인과관계 비틀기 (오답 설계)]**:
+   - 단순히 '아니다'를 붙이는 유치한 오답을 금지합니다.
+   - 'A라서 B이다'를 'B라서 A이다'로 **인과관계를 뒤집거나**, 주체(주어)와 객체(목적어)를 서로 바꾸어 매력적인 오답을 만드시오.
+
+4. **[선지 분포]**:
+   - 선지 ①~⑤번이 지문의 특정 부분에 쏠리지 않게, 지문 전체(서론, 본론, 결론)를 아우르도록 배치하시오.
+
+**[Step 2] 문제 출제**
+{REQS}
+    """.format(
+        STEP1 = "**[Step 1] 지문 인식** - 아래 입력 지문 기반. 문제지 본문에는 지문을 다시 출력하지 마시오.",
+        USER_BLOCK = "\n[사용자 입력 지문 시작]\n" + passage_text + "\n[사용자 입력 지문 끝]\n",
+        BG_PROM = bg_instruction,
+        REQS = reqs_str
+    )
+
+    def clean_question_html(text):
+        text = clean_llm_html(text)
+        text = re.sub(r'<h[12].*?>.*?</h[12]>', '', text, flags=re.DOTALL | re.IGNORECASE)
+        # 지문은 화면 조립 단계에서 별도로 출력하므로, AI가 지문을 다시 출력한 경우 제거
+        return re.sub(r'<div[^>]*class=["\']passage["\'][^>]*>.*?</div>', '', text, flags=re.DOTALL | re.IGNORECASE)
+
+    extra_context = "\n**[참고: 지문 원문]**\n" + passage_text + "\n"
+    summary_prompt = ""
+    if use_summary:
+        # [수정] AI에게 구조적 개조식 요약을 강제하는 상세 지침 (원본 유지)
+        structure_inst = (
+            "단순한 서술형 문장이 아니라, 정보를 명확히 분류한 **[개조식]** 형태로 요약하시오. "
+            "반드시 **1. 핵심 화제, 2. 논리적 전개 방식(정의, 대조, 인과 등), 3. 핵심 요지** 항목을 명확히 구분하여 "
+            "'- 화제: [내용] / - 방식: [내용] / - 요지: [내용]'과 같이 구조화된 형식을 사용하여 가독성을 높이시오."
+        )
+        p_cnt = len([p for p in re.split(r'\n\s*\n', passage_text.strip()) if p.strip()])
+        summary_prompt = f"- **[필수 - 최우선 작성]**: 답변 맨 위에 `<div class='summary-ans-box'>`를 열고 **[문단별 구조적 요약 예시 답안]**을 작성하시오. 총 {p_cnt}개의 문단 요약을 제시하시오. 지침: {structure_inst}"
+
+    if pipelined and html_q is None:
+        # [파이프라인] 문제지 스트리밍 중 완성된 문항 묶음부터 해설을 먼저 요청 (요약 예시 답안은 첫 묶음에만)
+        def build_answer_prompt(group_html, group_idx):
+            return """
+당신은 대한민국 수능 국어 출제 위원장입니다. 아래 [입력된 문제]는 전체 {T_CNT}문제 중 일부입니다. **입력된 문항 전부**의 정답 및 해설을 문항 번호 순서대로 HTML로 작성하시오.
+{CONTEXT}
+[입력된 문제]: {Q_TEXT}
+{SUM_PROM}
+[규칙]: 객관식은 정답 상세 해설 + 오답 분석 필수. OX/빈칸은 지문 근거 필수.
+            """.format(T_CNT=total_q_cnt, CONTEXT=extra_context, Q_TEXT=group_html, SUM_PROM=summary_prompt if group_idx == 0 else "")
+
+        raw_q, final_ans_parts = stream_questions_with_answers(p1_prompt, build_answer_prompt, status_placeholder=status_placeholder, answer_slots=answer_slots)
+        html_q = clean_question_html(raw_q)
+        if final_ans_parts:
+            final_ans_parts[0] = '<div class="answer-sheet"><h2 class="ans-main-title">정답 및 해설</h2>' + final_ans_parts[0]
+    else:
+        if html_q is None:
+            res_q = generate_content_with_fallback(p1_prompt, status_placeholder=status_placeholder)
+            html_q = clean_question_html(res_q.text)
+
+        # [복구] 해설 분할 생성 (Batch Size 6) 로직
+        BATCH_SIZE = 6; final_ans_parts = []
+
+        for i in range(0, total_q_cnt, BATCH_SIZE):
+            start_num = i + 1; end_num = min(i + BATCH_SIZE, total_q_cnt)
+            if status_placeholder:
+                status_placeholder.info(f"📝 정답 및 해설 생성 중... ({start_num}~{end_num}번 / 총 {total_q_cnt}문항)")
+
+            p_chunk = """
+당신은 대한민국 수능 국어 출제 위원장입니다. {T_CNT}문제 중 **{S_NUM}번부터 {E_NUM}번까지**의 정답 및 해설을 HTML로 작성하시오.
+{CONTEXT}
+[입력된 문제]: {Q_TEXT}
+{SUM_PROM}
+[규칙]: 객관식은 정답 상세 해설 + 오답 분석 필수. OX/빈칸은 지문 근거 필수.
+            """.format(T_CNT=total_q_cnt, S_NUM=start_num, E_NUM=end_num, CONTEXT=extra_context, Q_TEXT=html_q, SUM_PROM=summary_prompt if i == 0 else "")
+
+            res_chunk = generate_content_with_fallback(p_chunk, status_placeholder=status_placeholder)
+            chunk_text = clean_llm_html(res_chunk.text)
+            if i == 0: chunk_text = '<div class="answer-sheet"><h2 class="ans-main-title">정답 및 해설</h2>' + chunk_text
+            final_ans_parts.append(chunk_text)
+
+    html_answers = "".join(final_ans_parts) + "</div>"
+    return html_q, html_answers
+
+# ==========================================
+# [비문학 파이프라인] UI 입력값 → 완성 HTML
+# ==========================================
+def run_non_fiction_pipeline(main_title, d_mode, topic, domain, difficulty, q_counts, label_type1, manual_p="", show_passage=True,
+                             use_background=False, use_summary=True, reuse_passage=True, variant_count=1, use_bank=False, pipelined=False,
+                             speculative_owner=None, status=None):
+    """비문학 모의고사 전체 생성 (지문 → 문제 → 해설). q_counts: {"t1": 0/1, "t2": 문항 수, ..., "t7": 문항 수}.
+    Streamlit 위젯에 의존하지 않으므로 벤치마크 등 UI 밖에서도 호출 가능."""
+    status = status or NullStatus()
+    select_t1 = q_counts.get("t1", 0) > 0
+    count_t2 = q_counts.get("t2", 0); select_t2 = count_t2 > 0
+    count_t3 = q_counts.get("t3", 0); select_t3 = count_t3 > 0
+    count_t4 = q_counts.get("t4", 0); select_t4 = count_t4 > 0
+    count_t5 = q_counts.get("t5", 0); select_t5 = count_t5 > 0
+    count_t6 = q_counts.get("t6", 0); select_t6 = count_t6 > 0
+    count_t7 = q_counts.get("t7", 0); select_t7 = count_t7 > 0
+
+    # [복구] 상세 문항 가이드라인
+    req_list = []; type_specs = []  # type_specs: 문제 은행 조회용 (유형 제목, 문항 수)
+    if select_t1: req_list.append('<div class="question-box"><span class="question-text">1. ' + label_type1 + '</span><div class="write-box"></div></div><br><br>')
+    if select_t2: req_list.append('<h3>내용 일치 O/X (' + str(count_t2) + '문항)</h3>- 문항 끝에 ( O / X ) 포함. 각 문제 뒤에 <br><br> 삽입.'); type_specs.append(("내용 일치 O/X", count_t2))
+    if select_t3: req_list.append('<h3>빈칸 채우기 (' + str(count_t3) + '문항)</h3>- 빈칸은 `<span class="blank">&nbsp;&nbsp;&nbsp;&nbsp;</span>` 사용. 각 문제 뒤에 <br><br> 삽입.'); type_specs.append(("빈칸 채우기", count_t3))
+    if select_t4: req_list.append('<h3>변형 문장 정오판단 (' + str(count_t4) + '문항)</h3>- 문항 끝에 ( O / X ) 포함. 각 문제 뒤에 <br><br> 삽입.'); type_specs.append(("변형 문장 정오판단", count_t4))
+    mcq_tpl = '<div class="question-box"><span class="question-text">[문제번호] [발문]</span><div class="choices"><div>① ...</div><div>② ...</div><div>③ ...</div><div>④ ...</div><div>⑤ ...</div></div></div><br><br>'
+    if select_t5: req_list.append('<h3>객관식: 세부 내용 파악 (' + str(count_t5) + '문항)</h3>' + mcq_tpl); type_specs.append(("객관식: 세부 내용 파악", count_t5))
+    if select_t6: req_list.append('<h3>객관식: 추론 및 비판 (' + str(count_t6) + '문항)</h3>' + mcq_tpl); type_specs.append(("객관식: 추론 및 비판", count_t6))
+    if select_t7: req_list.append('<h3>객관식: [보기] 적용 문제 (' + str(count_t7) + '문항) [3점]</h3><div class="question-box"><span class="question-text">[문제번호] 윗글을 바탕으로 [보기]를 이해한 내용으로 적절하지 않은 것은? [3점]</span><div class="example-box">(보기 내용)</div><div class="choices"><div>① ...</div><div>② ...</div><div>③ ...</div><div>④ ...</div><div>⑤ ...</div></div></div><br><br>'); type_specs.append(("객관식: [보기] 적용 문제", count_t7))
+    
+    reqs_str = "\n".join(req_list)
+
+    bg_instruction = ""
+    if use_background:
+        bg_instruction = """
+        - **[배경지식 플러스 서술]**: 모든 문제 출제가 끝난 후, 맨 마지막에 지문의 주제와 관련된 심화 배경지식을 정리하시오.
+        - 제목은 `<div class="background-title">💡 배경지식 플러스</div>`로 하고, 전체 내용은 `<div class="background-box">`로 감싸시오.
+        - 지문에서 다룬 원리나 사건의 유래, 현실 세계의 적용 사례 등을 500자 내외로 상세하고 친절하게 설명하시오.
+        """
+
+    # [1단계] 지문 확보 (AI 생성 모드: 지문 뱅크 재사용 또는 신규 생성)
+    if d_mode == 'AI 생성':
+        status.info("📚 지문 준비 중...")
+        html_p, reused = get_or_create_passage(topic, domain, difficulty, reuse=reuse_passage, status_placeholder=status, speculative_owner=speculative_owner)
+        if reused: status.info("♻️ 저장된 지문을 재사용합니다.")
+        passage_text = passage_html_to_text(html_p)
+    else:
+        passage_text = manual_p
+
+    # [2단계] 저장된 지문 기반 문제 + 해설 생성 (세트별 병렬)
+    total_q_cnt = sum([1 if select_t1 else 0, count_t2, count_t3, count_t4, count_t5, count_t6, count_t7])
+    passage_key = hashlib.sha1(passage_text.encode("utf-8")).hexdigest()
+    # [문제 은행] 같은 지문의 저장 문항으로 모든 유형을 채울 수 있으면 문제 출제 호출 생략 (배경지식 요청 시 제외)
+    bank_sheets = [None] * variant_count
+    if use_bank and not use_background:
+        lead_html = req_list[0] if select_t1 else ""
+        bank_sheets = [build_sheet_from_bank("비문학", passage_key, type_specs, lead_html, start_number=2 if select_t1 else 1) for _ in range(variant_count)]
+        if any(bank_sheets): status.info(f"📦 문제 은행에서 {sum(1 for b in bank_sheets if b)}개 세트를 조립했습니다.")
+    answer_slots = new_answer_slots()  # 세트 수와 관계없이 이번 생성 전체의 해설 동시 요청 수 제한
+    if variant_count == 1:
+        question_sets = [generate_nf_question_set(passage_text, reqs_str, bg_instruction, total_q_cnt, use_summary, status_placeholder=status, html_q=bank_sheets[0], pipelined=pipelined, answer_slots=answer_slots)]
+    else:
+        # 스레드 내부에서는 Streamlit 위젯 갱신이 불가하므로 진행 상태는 메인에서만 표시
+        status.info(f"⚡ 같은 지문으로 문제 세트 {variant_count}개 동시 생성 중...")
+        with ThreadPoolExecutor(max_workers=variant_count) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, generate_nf_question_set, passage_text, reqs_str, bg_instruction, total_q_cnt, use_summary, html_q=bank_sheets[idx], pipelined=pipelined, answer_slots=answer_slots) for idx in range(variant_count)]
+            question_sets = [f.result() for f in futures]
+
+    # 새로 생성한 문항은 문제 은행에 저장 (유사 문항은 자동 제외)
+    for bank_sheet, (html_q, _) in zip(bank_sheets, question_sets):
+        if bank_sheet is None:
+            # 1번 요약 서술형(h3 이전)은 고정 발문이므로 lead_type=None으로 제외
+            index_generated_questions(html_q, "비문학", passage_key, topic=topic, domain=domain, lead_type=None)
+
+    full_html = HTML_HEAD + get_custom_header_html(main_title, topic)
+
+    # [지문 출력 제어] 지문은 문제지와 분리되어 있으므로 옵션에 따라 한 번만 출력
+    if show_passage:
+        if d_mode == '직접 입력':
+            paras = [p.strip() for p in re.split(r'\n\s*\n', manual_p.strip()) if p.strip()]
+            formatted_p = "".join([f"<p>{p}</p>" + ("<div class='summary-blank'>📝 문단 요약 연습: </div>" if use_summary else "") for p in paras])
+            full_html += f'<div class="passage">{formatted_p}</div>'
+        else:
+            full_html += add_summary_blanks(html_p) if use_summary else html_p
+
+    for idx, (html_q, html_answers) in enumerate(question_sets):
+        if variant_count > 1:
+            full_html += f'<div class="variant-title{" next-set" if idx else ""}">문제 세트 {chr(ord("A") + idx)}</div>'
+        full_html += html_q + html_answers
+
+    full_html += HTML_TAIL
+    sections = {"mode": "비문학", "passage": passage_text, "question_sets": [{"questions": q, "answers": a} for q, a in question_sets]}
+    return {"full_html": full_html, "main_title": main_title, "topic_title": topic, "sections": sections}
 
 # ==========================================
 # 🧩 1. 비문학 문제 제작 함수 (원본 100% 보존 + 기능 추가)
@@ -409,10 +1527,23 @@ def non_fiction_app():
                 current_topic = "(가) " + topic_a + " / (나) " + topic_b
             difficulty = st.select_slider("난이도", ["중", "상", "최상"], value="최상")
             current_difficulty = difficulty
+            # [신규] 지문 뱅크: 같은 주제/영역/난이도의 저장 지문을 재사용 (지문 생성 호출 생략)
+            # 기본값은 꺼짐: 켜면 같은 주제로 다시 생성해도 새 지문 대신 저장된 지문이 나오므로 명시적으로 선택할 때만 사용
+            reuse_passage = st.checkbox("♻️ 저장된 지문 재사용", value=False, key="nf_reuse_p",
+                                        help="켜면 같은 주제·영역·난이도로 이전에 생성한 지문을 다시 사용합니다 (새 지문을 만들지 않음).")
+            # [신규] 주제가 몇 초간 바뀌지 않으면 문제 유형을 고르는 동안 지문을 미리 생성
+            speculative = st.checkbox("🔮 지문 미리 생성 (설정 중 백그라운드)", value=False, key="nf_speculative")
+            topic_ready = bool(topic.strip()) if mode == "단일 지문" else bool(topic_a.strip() and topic_b.strip())
+            update_speculative_inputs(current_topic, current_domain, current_difficulty, speculative and topic_ready)
+            if speculative:
+                speculative_passage_watcher()
         else: 
             mode = st.radio("지문 구성", ["단일 지문", "주제 통합"], key="manual_mode")
             current_topic = "사용자 지문"
             current_difficulty = "사용자 지정" 
+            current_domain = "사용자 지정"
+            reuse_passage = False
+            update_speculative_inputs(current_topic, current_domain, current_difficulty, False)
 
         st.header("2️⃣ 문제 유형 및 개수 선택")
         if mode.startswith("단일"):
@@ -429,6 +1560,10 @@ def non_fiction_app():
         select_t7 = st.checkbox("7. 객관식 (보기 적용 3점)", value=True, key="select_t7"); count_t7 = st.number_input(" - 문항 수", 1, 10, 1, key="t7") if select_t7 else 0
         
         use_summary = st.checkbox("📌 문단별 요약 훈련 칸 생성", value=True, key="select_summary")
+        # [신규] 같은 지문으로 서로 다른 문제 세트를 동시에 생성
+        variant_count = st.number_input("문제 세트 수 (같은 지문)", 1, 5, 1, key="nf_variants")
+        # [신규] 문제 은행: 같은 지문으로 이전에 출제된 문항이 충분하면 재사용
+        use_bank = st.checkbox("📦 문제 은행 우선 출제 (저장 문항 재사용)", value=False, key="nf_use_bank")
 
     if st.session_state.generation_requested:
         manual_p = ""
@@ -445,136 +1580,95 @@ def non_fiction_app():
         else:
             status = st.empty(); status.info(f"⚡ 출제 준비 중...")
             try:
-                # [복구] 상세 문항 가이드라인
-                req_list = []
-                if select_t1: req_list.append('<div class="question-box"><span class="question-text">1. ' + label_type1 + '</span><div class="write-box"></div></div><br><br>')
-                if select_t2: req_list.append('<h3>내용 일치 O/X (' + str(count_t2) + '문항)</h3>- 문항 끝에 ( O / X ) 포함. 각 문제 뒤에 <br><br> 삽입.')
-                if select_t3: req_list.append('<h3>빈칸 채우기 (' + str(count_t3) + '문항)</h3>- 빈칸은 `<span class="blank">&nbsp;&nbsp;&nbsp;&nbsp;</span>` 사용. 각 문제 뒤에 <br><br> 삽입.')
-                if select_t4: req_list.append('<h3>변형 문장 정오판단 (' + str(count_t4) + '문항)</h3>- 문항 끝에 ( O / X ) 포함. 각 문제 뒤에 <br><br> 삽입.')
-                mcq_tpl = '<div class="question-box"><span class="question-text">[문제번호] [발문]</span><div class="choices"><div>① ...</div><div>② ...</div><div>③ ...</div><div>④ ...</div><div>⑤ ...</div></div></div><br><br>'
-                if select_t5: req_list.append('<h3>객관식: 세부 내용 파악 (' + str(count_t5) + '문항)</h3>' + mcq_tpl)
-                if select_t6: req_list.append('<h3>객관식: 추론 및 비판 (' + str(count_t6) + '문항)</h3>' + mcq_tpl)
-                if select_t7: req_list.append('<h3>객관식: [보기] 적용 문제 (' + str(count_t7) + '문항) [3점]</h3><div class="question-box"><span class="question-text">[문제번호] 윗글을 바탕으로 [보기]를 이해한 내용으로 적절하지 않은 것은? [3점]</span><div class="example-box">(보기 내용)</div><div class="choices"><div>① ...</div><div>② ...</div><div>③ ...</div><div>④ ...</div><div>⑤ ...</div></div></div><br><br>')
-                
-                reqs_str = "\n".join(req_list)
-                
-                # [복구] 문단 요약 및 배경지식 프롬프트
-                summary_inst_passage = """
-                - **[필수]**: 각 문단이 끝날 때마다 반드시 `<div class='summary-blank'>📝 문단 요약 연습: (이곳에 핵심 내용을 요약해보세요)</div>` 코드를 삽입하여 사용자가 내용을 요약할 수 있는 빈칸을 만들어주시오.
-                - 이 부분은 사용자가 글을 쓸 공간이므로 절대 내용을 채우지 마시오.
-                """ if use_summary else ""
-
-                bg_instruction = ""
-                if use_background:
-                    bg_instruction = """
-                    - **[배경지식 플러스 서술]**: 모든 문제 출제가 끝난 후, 맨 마지막에 지문의 주제와 관련된 심화 배경지식을 정리하시오.
-                    - 제목은 `<div class="background-title">💡 배경지식 플러스</div>`로 하고, 전체 내용은 `<div class="background-box">`로 감싸시오.
-                    - 지문에서 다룬 원리나 사건의 유래, 현실 세계의 적용 사례 등을 500자 내외로 상세하고 친절하게 설명하시오.
-                    """
-
-                # [원본 유지] 지문 가이드라인 및 킬러 가이드
-                # [추가] 직접 입력 모드에서 지문을 중복 출력하지 않도록 명시
-                p1_prompt = """
-당신은 대한민국 수능 국어 출제 위원장입니다. 
-아래 지시사항에 맞춰 완벽한 HTML 포맷의 모의고사 문제지를 생성하시오.
-- `<html>`, `<head>` 생략, `<body>` 내용만 출력.
-- 정답 및 해설 제외. 학생용 문제지.
-# 🚨 [매우 중요] 출력 시 절대 제목/헤더를 생성하지 마시오. h1, h2 태그 및 제목 노출 금지.
-
-{STEP1}
-{USER_BLOCK}
-{BG_PROM}
+                q_counts = {"t1": 1 if select_t1 else 0, "t2": count_t2, "t3": count_t3, "t4": count_t4, "t5": count_t5, "t6": count_t6, "t7": count_t7}
+                publish_generated_result(run_non_fiction_pipeline(
+                    custom_main_title, current_d_mode, current_topic, current_domain, current_difficulty, q_counts, label_type1,
+                    manual_p=manual_p, show_passage=show_passage, use_background=use_background, use_summary=use_summary,
+                    reuse_passage=reuse_passage, variant_count=variant_count, use_bank=use_bank,
+                    pipelined=st.session_state.get("pipelined_answers", False),
+                    # 미리 생성을 켠 경우에만 이 세션이 요청한 미리 생성 지문을 사용
+                    speculative_owner=st.session_state.spec_owner if current_d_mode == 'AI 생성' and st.session_state.get("nf_speculative") else None,
+                    status=status
+                ))
+                status.success("✅ 비문학 생성 완료!"); st.session_state.generation_requested = False
+            except Exception as e: status.error(f"오류: {e}"); st.session_state.generation_requested = False
 
-# ----------------------------------------------------------------
-# 🚨 [고난도(킬러 문항) 출제 필수 가이드라인]
-# ----------------------------------------------------------------
-1. **[정보의 재구성 필수 - 1:1 매칭 금지]**: 
-   - 정답 선지는 절대 한 문단이나 한 문장의 내용만으로 판단할 수 없게 하시오.
-   - **반드시 '1문단 + 3문단' 혹은 'A주장 + B반론'처럼 서로 멀리 떨어진 두 개 이상의 정보를 결합**해야만 참/거짓을 판별할 수 있도록 문장을 재구성하시오.
+# ==========================================
+# [소설 파이프라인] UI 입력값 → 완성 HTML
+# ==========================================
+def run_fiction_pipeline(main_title, work_name, author_name, text, q_counts, show_passage=True, pipelined=False, status=None):
+    """소설 문제지 + 해설 생성. q_counts: {"fv", "fe", "fm", "fb": 문항 수, "f5"~"f8": 0/1} (사이드바 위젯 key 기준)."""
+    status = status or NullStatus()
+    cv = q_counts.get("fv", 0); uv = cv > 0
+    ce = q_counts.get("fe", 0); ue = ce > 0
+    cm = q_counts.get("fm", 0); um = cm > 0
+    cb = q_counts.get("fb", 0); ub = cb > 0
+    u5, u6, u7, u8 = (q_counts.get(k, 0) > 0 for k in ("f5", "f6", "f7", "f8"))
 
-2. **[단어 바꿔치기(Paraphrasing)]**:
-   - 지문에 있는 단어를 그대로 선지에 쓰지 마시오.
-   - 지문의 '상승했다'를 '하락하지 않았다'나 '고점에 도달했다'처럼 **동의어나 함축적 의미로 변환**하여 선지를 작성하시오.
+    req_list = []
+    if uv: req_list.append('<div class="type-box"><h3>유형 1. 어휘 문제 (' + str(cv) + '문항)</h3>- 지문의 어려운 어휘 ' + str(cv) + '개의 의미 묻기 (단답형).<div class="question-box"><span class="question-text">[번호] "____"의 문맥적 의미는?</span><div class="write-box" style="height:50px;"></div></div></div><br><br>')
+    if ue: req_list.append('<div class="type-box"><h3>유형 2. 서술형 심화 문제 (' + str(ce) + '문항)</h3>- 작가의 의도, 효과, 이유를 묻는 고난도 서술형.<div class="write-box"></div></div><br><br>')
+    if um: req_list.append('<div class="type-box"><h3>유형 3. 객관식 문제 (일반) (' + str(cm) + '문항)</h3>- 수능형 5지 선다 (추론/비판).<div class="question-box"><span class="question-text">[번호] (발문)</span><div class="choices"><div>① ...</div><div>② ...</div><div>③ ...</div><div>④ ...</div><div>⑤ ...</div></div></div></div><br><br>')
+    if ub: req_list.append('<div class="type-box"><h3>유형 4. 객관식 문제 (보기 적용) (' + str(cb) + '문항)</h3>- **<보기>** 박스 필수 포함 (3점 킬러문항).<div class="example-box">(보기 내용)</div><div class="choices"><div>① ...</div><div>② ...</div><div>③ ...</div><div>④ ...</div><div>⑤ ...</div></div></div></div><br><br>')
+    if u5: req_list.append('<div class="type-box"><h3>유형 5. 주요 등장인물 정리</h3>- 인물명, 호칭, 역할, 심리 빈칸 표 제공.</div><br><br>')
+    if u6: req_list.append('<div class="type-box"><h3>유형 6. 소설 속 상황 요약</h3>- 핵심 갈등 요약 서술.<div class="write-box"></div></div><br><br>')
+    if u7: req_list.append('<div class="type-box"><h3>유형 7. 인물 관계도 및 갈등</h3>- 직접 그릴 수 있는 박스.<div class="write-box" style="height:200px;"></div></div><br><br>')
+    if u8: req_list.append('<div class="type-box"><h3>유형 8. 갈등 구조 및 심리 정리</h3>- 갈등 양상 및 비판 의도 서술.<div class="write-box"></div></div><br><br>')
+    
+    r_str = "\n".join(req_list)
+    p1_p = """
+당신은 수능 문학 출제위원입니다. 작품 '{W_N}'({A_N}) 기반 학생용 문제지(HTML)를 작성하시오.
+# 🚨 [수능 최고난도 출제 지침]
+1. **[복합적 사고]**: 작품 전체 맥락과 함축적 의미를 종합해야 풀 수 있는 문제.
+2. **[매력적인 오답]**: 부분적 진실, 주객 전도, 과잉 해석 함정 배치.
+3. **[보기 적용]**: 비평적 관점을 적용해 새롭게 해석하는 3점 문항.
+4. **[가독성 개선]**: 모든 문항 뒤에 <br><br>을 삽입하시오.
 
-3. **[인과관계 비틀기 (오답 설계)]**:
-   - 단순히 '아니다'를 붙이는 유치한 오답을 금지합니다.
-   - 'A라서 B이다'를 'B라서 A이다'로 **인과관계를 뒤집거나**, 주체(주어)와 객체(목적어)를 서로 바꾸어 매력적인 오답을 만드시오.
+# 🚨 [매우 중요] h1, h2 제목 생성 금지. 본문 내용부터 바로 출력. 지문 본문은 절대 포함하지 마시오.
+본문: {BODY}
+[출제 요청 목록]:
+{REQS}
+    """.format(W_N=work_name, A_N=author_name, BODY=text, REQS=r_str)
+    
+    if pipelined:
+        # [파이프라인] 문제지 스트리밍 중 완성된 유형(h3)/문항 묶음부터 해설을 먼저 요청
+        def build_answer_prompt(group_html, group_idx):
+            return """
+당신은 수능 문학 해설 위원입니다. 아래는 작품 '{W_N}' 문제지의 일부입니다. 입력된 문항 전부에 대한 **완벽한 정답 및 해설**을 HTML로 작성하시오. answer-sheet div는 열지 마시오.
+**[작성 규칙]**: 1. 객관식은 [정답], [상세 해설], [오답 분석] 필수. 2. 활동형은 예시 답안 제시.
+[입력 문제 내용]: {Q_TEXT}
+            """.format(W_N=work_name, Q_TEXT=group_html)
 
-4. **[선지 분포]**:
-   - 선지 ①~⑤번이 지문의 특정 부분에 쏠리지 않게, 지문 전체(서론, 본론, 결론)를 아우르도록 배치하시오.
+        raw_q, ans_parts = stream_questions_with_answers(p1_p, build_answer_prompt, status_placeholder=status)
+        html_q = re.sub(r'<h[12].*?>.*?</h[12]>', '', clean_llm_html(raw_q), flags=re.DOTALL | re.IGNORECASE)
+        html_a = '<div class="answer-sheet">' + "".join(ans_parts) + '</div>'
+    else:
+        res_q = generate_content_with_fallback(p1_p, status_placeholder=status)
+        html_q = res_q.text.replace("```html","").replace("```","").strip()
+        html_q = re.sub(r'<h[12].*?>.*?</h[12]>', '', html_q, flags=re.DOTALL | re.IGNORECASE)
 
-**[Step 2] 문제 출제**
-{REQS}
-                """.format(
-                    STEP1 = f"**[Step 1] 지문 작성** - 주제: {current_topic}, 난이도: {difficulty}, 길이: 1800자 내외. 생성된 지문은 반드시 `<div class='passage'>` 태그로 감싸시오. \n{summary_inst_passage}" if current_d_mode == 'AI 생성' else "**[Step 1] 지문 인식** - 사용자 입력 지문 기반. 문제지 본문에는 지문을 다시 출력하지 마시오.",
-                    USER_BLOCK = "\n[사용자 입력 지문 시작]\n" + manual_p + "\n[사용자 입력 지문 끝]\n" if current_d_mode == '직접 입력' else "",
-                    BG_PROM = bg_instruction,
-                    REQS = reqs_str
-                )
-                
-                res_q = generate_content_with_fallback(p1_prompt, status_placeholder=status)
-                html_q = res_q.text.replace("```html", "").replace("```", "").strip()
-                html_q = re.sub(r'<h[12].*?>.*?</h[12]>', '', html_q, flags=re.DOTALL | re.IGNORECASE)
-
-                # [복구] 해설 분할 생성 (Batch Size 6) 로직
-                total_q_cnt = sum([1 if select_t1 else 0, count_t2, count_t3, count_t4, count_t5, count_t6, count_t7])
-                BATCH_SIZE = 6; final_ans_parts = []; summary_done = False
-                extra_context = "\n**[참고: 지문 원문]**\n" + manual_p + "\n" if current_d_mode == '직접 입력' else ""
-
-                for i in range(0, total_q_cnt, BATCH_SIZE):
-                    start_num = i + 1; end_num = min(i + BATCH_SIZE, total_q_cnt)
-                    status.info(f"📝 정답 및 해설 생성 중... ({start_num}~{end_num}번 / 총 {total_q_cnt}문항)")
-                    
-                    current_summary_prompt = ""
-                    if use_summary and not summary_done:
-                        # [수정] AI에게 구조적 개조식 요약을 강제하는 상세 지침 (원본 유지)
-                        structure_inst = (
-                            "단순한 서술형 문장이 아니라, 정보를 명확히 분류한 **[개조식]** 형태로 요약하시오. "
-                            "반드시 **1. 핵심 화제, 2. 논리적 전개 방식(정의, 대조, 인과 등), 3. 핵심 요지** 항목을 명확히 구분하여 "
-                            "'- 화제: [내용] / - 방식: [내용] / - 요지: [내용]'과 같이 구조화된 형식을 사용하여 가독성을 높이시오."
-                        )
-                        if current_d_mode == '직접 입력':
-                             p_cnt = len([p for p in re.split(r'\n\s*\n', manual_p.strip()) if p.strip()])
-                             current_summary_prompt = f"- **[필수 - 최우선 작성]**: 답변 맨 위에 `<div class='summary-ans-box'>`를 열고 **[문단별 구조적 요약 예시 답안]**을 작성하시오. 총 {p_cnt}개의 문단 요약을 제시하시오. 지침: {structure_inst}"
-                        else:
-                             current_summary_prompt = f"- **[필수 - 최우선 작성]**: 답변 맨 위에 `<div class='summary-ans-box'>`를 열고 **[문단별 구조적 요약 예시 답안]**을 작성하시오. 지침: {structure_inst}"
-                        summary_done = True 
-
-                    p_chunk = """
-당신은 대한민국 수능 국어 출제 위원장입니다. {T_CNT}문제 중 **{S_NUM}번부터 {E_NUM}번까지**의 정답 및 해설을 HTML로 작성하시오.
-{CONTEXT}
-[입력된 문제]: {Q_TEXT}
-{SUM_PROM}
-[규칙]: 객관식은 정답 상세 해설 + 오답 분석 필수. OX/빈칸은 지문 근거 필수.
-                    """.format(T_CNT=total_q_cnt, S_NUM=start_num, E_NUM=end_num, CONTEXT=extra_context, Q_TEXT=html_q, SUM_PROM=current_summary_prompt)
-                    
-                    res_chunk = generate_content_with_fallback(p_chunk, status_placeholder=status)
-                    chunk_text = res_chunk.text.replace("```html","").replace("```","").strip()
-                    if i == 0: chunk_text = '<div class="answer-sheet"><h2 class="ans-main-title">정답 및 해설</h2>' + chunk_text
-                    final_ans_parts.append(chunk_text)
-
-                html_answers = "".join(final_ans_parts) + "</div>"
-                full_html = HTML_HEAD + get_custom_header_html(custom_main_title, current_topic)
-                
-                # [지문 출력 제어 강화 로직]
-                processed_html_q = html_q
-                if not show_passage:
-                    # AI가 생성한 문자열 내부에서 passage 클래스를 가진 영역을 정규식으로 완벽 제거
-                    processed_html_q = re.sub(r'<div[^>]*class=["\']passage["\'][^>]*>.*?</div>', '', html_q, flags=re.DOTALL | re.IGNORECASE)
-                    full_html += processed_html_q
-                else:
-                    if current_d_mode == '직접 입력':
-                        paras = [p.strip() for p in re.split(r'\n\s*\n', manual_p.strip()) if p.strip()]
-                        formatted_p = "".join([f"<p>{p}</p>" + ("<div class='summary-blank'>📝 문단 요약 연습: </div>" if use_summary else "") for p in paras])
-                        full_html += f'<div class="passage">{formatted_p}</div>' + processed_html_q
-                    else:
-                        # AI 생성 모드에서는 AI가 이미 <div class='passage'>를 생성했으므로 그대로 출력
-                        full_html += processed_html_q
-                
-                full_html += html_answers + HTML_TAIL
-                st.session_state.generated_result = {"full_html": full_html, "main_title": custom_main_title, "topic_title": current_topic}
-                status.success("✅ 비문학 생성 완료!"); st.session_state.generation_requested = False
-            except Exception as e: status.error(f"오류: {e}"); st.session_state.generation_requested = False
+        p2_p = """
+당신은 수능 문학 해설 위원입니다. 앞서 출제된 문제들에 대한 **완벽한 정답 및 해설**을 <div class="answer-sheet"> 내부에 작성하시오.
+**[작성 규칙]**: 1. 객관식은 [정답], [상세 해설], [오답 분석] 필수. 2. 활동형은 예시 답안 제시.
+[입력 문제 내용]: {Q_TEXT}
+        """.format(Q_TEXT=html_q)
+        res_a = generate_content_with_fallback(p2_p, status_placeholder=status)
+        html_a = res_a.text.replace("```html","").replace("```","").strip()
+    index_generated_questions(html_q, "소설", hashlib.sha1(text.encode("utf-8")).hexdigest(), topic=work_name, genre="소설")
+    
+    full_html = HTML_HEAD + get_custom_header_html(main_title, work_name)
+    
+    # [지문 출력 완벽 제어]
+    processed_html_q = html_q
+    if not show_passage:
+        processed_html_q = re.sub(r'<div[^>]*class=["\']passage["\'][^>]*>.*?</div>', '', html_q, flags=re.DOTALL | re.IGNORECASE)
+        full_html += processed_html_q
+    else:
+        full_html += f'<div class="passage">{text.replace(chr(10), "<br>")}</div>' + processed_html_q
+    
+    full_html += html_a + HTML_TAIL
+    sections = {"mode": "소설", "passage": text, "questions": html_q, "answers": html_a}
+    return {"full_html": full_html, "main_title": main_title, "topic_title": work_name, "sections": sections}
 
 # ==========================================
 # 📖 2. 소설 문제 제작 함수 (원본 100% 보존 + 기능 추가)
@@ -600,57 +1694,105 @@ def fiction_app():
         if not text: st.warning("본문을 입력하세요."); st.session_state.generation_requested = False; return
         status = st.empty(); status.info("⚡ 소설 심층 분석 및 문제 제작 중...")
         try:
-            req_list = []
-            if uv: req_list.append('<div class="type-box"><h3>유형 1. 어휘 문제 (' + str(cv) + '문항)</h3>- 지문의 어려운 어휘 ' + str(cv) + '개의 의미 묻기 (단답형).<div class="question-box"><span class="question-text">[번호] "____"의 문맥적 의미는?</span><div class="write-box" style="height:50px;"></div></div></div><br><br>')
-            if ue: req_list.append('<div class="type-box"><h3>유형 2. 서술형 심화 문제 (' + str(ce) + '문항)</h3>- 작가의 의도, 효과, 이유를 묻는 고난도 서술형.<div class="write-box"></div></div><br><br>')
-            if um: req_list.append('<div class="type-box"><h3>유형 3. 객관식 문제 (일반) (' + str(cm) + '문항)</h3>- 수능형 5지 선다 (추론/비판).<div class="question-box"><span class="question-text">[번호] (발문)</span><div class="choices"><div>① ...</div><div>② ...</div><div>③ ...</div><div>④ ...</div><div>⑤ ...</div></div></div></div><br><br>')
-            if ub: req_list.append('<div class="type-box"><h3>유형 4. 객관식 문제 (보기 적용) (' + str(cb) + '문항)</h3>- **<보기>** 박스 필수 포함 (3점 킬러문항).<div class="example-box">(보기 내용)</div><div class="choices"><div>① ...</div><div>② ...</div><div>③ ...</div><div>④ ...</div><div>⑤ ...</div></div></div></div><br><br>')
-            if u5: req_list.append('<div class="type-box"><h3>유형 5. 주요 등장인물 정리</h3>- 인물명, 호칭, 역할, 심리 빈칸 표 제공.</div><br><br>')
-            if u6: req_list.append('<div class="type-box"><h3>유형 6. 소설 속 상황 요약</h3>- 핵심 갈등 요약 서술.<div class="write-box"></div></div><br><br>')
-            if u7: req_list.append('<div class="type-box"><h3>유형 7. 인물 관계도 및 갈등</h3>- 직접 그릴 수 있는 박스.<div class="write-box" style="height:200px;"></div></div><br><br>')
-            if u8: req_list.append('<div class="type-box"><h3>유형 8. 갈등 구조 및 심리 정리</h3>- 갈등 양상 및 비판 의도 서술.<div class="write-box"></div></div><br><br>')
-            
-            r_str = "\n".join(req_list)
-            p1_p = """
-당신은 수능 문학 출제위원입니다. 작품 '{W_N}'({A_N}) 기반 학생용 문제지(HTML)를 작성하시오.
-# 🚨 [수능 최고난도 출제 지침]
-1. **[복합적 사고]**: 작품 전체 맥락과 함축적 의미를 종합해야 풀 수 있는 문제.
-2. **[매력적인 오답]**: 부분적 진실, 주객 전도, 과잉 해석 함정 배치.
-3. **[보기 적용]**: 비평적 관점을 적용해 새롭게 해석하는 3점 문항.
-4. **[가독성 개선]**: 모든 문항 뒤에 <br><br>을 삽입하시오.
+            q_counts = {"fv": cv, "fe": ce, "fm": cm, "fb": cb, "f5": int(u5), "f6": int(u6), "f7": int(u7), "f8": int(u8)}
+            publish_generated_result(run_fiction_pipeline(custom_main_title, work_name, author_name, text, q_counts, show_passage=show_passage,
+                                                          pipelined=st.session_state.get("pipelined_answers", False), status=status))
+            status.success("✅ 소설 분석 완료!"); st.session_state.generation_requested = False
+        except Exception as e: status.error(f"오류: {e}"); st.session_state.generation_requested = False
 
-# 🚨 [매우 중요] h1, h2 제목 생성 금지. 본문 내용부터 바로 출력. 지문 본문은 절대 포함하지 마시오.
+# ==========================================
+# [운문 파이프라인] UI 입력값 → 완성 HTML
+# ==========================================
+def run_poetry_pipeline(main_title, work_name, author_name, genre, text, ox_count, essay_count, vocab_analysis=True, show_passage=True, pipelined=False, status=None):
+    """운문 분석 차트 + 8번(OX)·9번(서술형) 문항 + 해설 생성. 문항 수가 0이면 해당 유형 제외."""
+    status = status or NullStatus()
+    ct8 = ox_count > 0; ct9 = essay_count > 0
+
+    # [복구] 어휘 풀이 행 동적 생성
+    vocab_row = ""
+    if vocab_analysis:
+        vocab_row = "  <tr><th>7. 주요 어휘 및 구절 풀이</th><td>(지문 속 중요 어휘나 난해한 구절을 상세히 풀이)</td></tr>"
+
+    # [원본 유지] 분석 차트 프롬프트
+    p_chart = """
+당신은 수능 국어 강사입니다. 운문 작품 '{W_N}'({A_N}, 갈래: {G_N})를 분석하여 아래 HTML 차트를 제작하시오.
+[포맷 지침]: 반드시 아래 HTML 구조를 엄격히 지켜서 출력할 것.
+1. 사용자가 설정한 갈래인 '{G_N}'의 특성을 정확히 반영하여 분석하시오.
+2. 각 항목의 내용은 1), 2), 3) 과 같은 순서 표시를 사용하여 요점 위주로 작성하시오.
+3. 내용이 길어질 경우 적절한 줄바꿈을 포함하여 가독성을 높이시오.
+4. 제목 칸(th)의 너비는 120px로 고정되도록 디자인 지침을 따르시오.
+
+<div class="analysis-title">운문 분석 : {W_N} ({G_N})</div>
+<table class="analysis-chart">
+  <tr><th>1. 작품 개요</th><td>(갈래 {G_N}의 형식적 특징, 성격, 주제 등을 상세히 기술)</td></tr>
+  <tr><th>2. 핵심 내용 정리</th><td>(시상 전개 과정 및 핵심 상황 요약)</td></tr>
+  <tr><th>3. 주요 소재의 상징성</th><td>(주요 시어 및 비유적 소재의 의미 분석)</td></tr>
+  <tr><th>4. 표현상의 특징</th><td>(사용된 수사법, 심상, 어조, {G_N} 특유의 율격 특징)</td></tr>
+  <tr><th>5. 작품의 이해와 감상</th><td>(작품의 문학적 가치와 종합적 감상평)</td></tr>
+  <tr><th>6. 수능의 키포인트</th><td>(이 작품에서 수능 고난도 킬러 문항으로 출제될 수 있는 포인트)</td></tr>
+{V_ROW}
+</table>
 본문: {BODY}
-[출제 요청 목록]:
+    """.format(W_N=work_name, A_N=author_name, G_N=genre, BODY=text, V_ROW=vocab_row)
+    
+    if pipelined:
+        # [파이프라인] 분석 차트는 문항과 무관하므로 문제지 스트리밍과 동시에 생성
+        chart_future = get_answer_executor().submit(contextvars.copy_context().run, generate_content_with_fallback, p_chart)
+    else:
+        res_chart = generate_content_with_fallback(p_chart, status_placeholder=status)
+        html_chart = res_chart.text.replace("```html","").replace("```","").strip()
+
+    # [원본 유지] 문제 생성 프롬프트
+    r_list = []
+    if ct8: r_list.append("문항 8. 수능형 선지 OX 판단 (" + str(ox_count) + "개) - 질문 끝에 ( ) 빈칸 출력. 각 문항 뒤 <br><br> 필수.")
+    if ct9: r_list.append("문항 9. 고난도 수능형 서술형 (" + str(essay_count) + "개) - 각 문항 뒤 <br><br> 필수.")
+    r_str = "\n".join(r_list)
+    
+    p_q = """
+당신은 수능 국어 출제 위원장입니다. 운문 작품 '{W_N}'(갈래: {G_N})를 바탕으로 학생용 문제지(HTML)를 제작하시오.
+[중요 지침]: 
+1. {G_N}의 장르적 특성을 고려하여 실제 수능형 문제를 출제하시오. 
+2. 출력 시 반드시 아래의 HTML 구조를 따를 것: 각 문항은 question-box 클래스를 사용하고 문항 끝에는 <br><br>을 삽입하시오.
+3. 시 본문은 이미 출력했으므로 **HTML 응답에 절대 시 본문을 포함하지 마시오.** 출제 요청:
 {REQS}
-            """.format(W_N=work_name, A_N=author_name, BODY=text, REQS=r_str)
-            
-            res_q = generate_content_with_fallback(p1_p, status_placeholder=status)
-            html_q = res_q.text.replace("```html","").replace("```","").strip()
-            html_q = re.sub(r'<h[12].*?>.*?</h[12]>', '', html_q, flags=re.DOTALL | re.IGNORECASE)
+본문: {BODY}
+    """.format(W_N=work_name, G_N=genre, REQS=r_str, BODY=text)
+    
+    if pipelined:
+        def build_answer_prompt(group_html, group_idx):
+            return "아래는 8~9번 문항 중 일부입니다. 입력된 문항 전부에 대해 교사용 완벽 정답 및 상세 해설을 작성하시오. answer-sheet div는 열지 마시오.\n문제 내용: " + group_html
 
-            p2_p = """
-당신은 수능 문학 해설 위원입니다. 앞서 출제된 문제들에 대한 **완벽한 정답 및 해설**을 <div class="answer-sheet"> 내부에 작성하시오.
-**[작성 규칙]**: 1. 객관식은 [정답], [상세 해설], [오답 분석] 필수. 2. 활동형은 예시 답안 제시.
-[입력 문제 내용]: {Q_TEXT}
-            """.format(Q_TEXT=html_q)
-            res_a = generate_content_with_fallback(p2_p, status_placeholder=status)
-            html_a = res_a.text.replace("```html","").replace("```","").strip()
-            
-            full_html = HTML_HEAD + get_custom_header_html(custom_main_title, work_name)
-            
-            # [지문 출력 완벽 제어]
-            processed_html_q = html_q
-            if not show_passage:
-                processed_html_q = re.sub(r'<div[^>]*class=["\']passage["\'][^>]*>.*?</div>', '', html_q, flags=re.DOTALL | re.IGNORECASE)
-                full_html += processed_html_q
-            else:
-                full_html += f'<div class="passage">{text.replace(chr(10), "<br>")}</div>' + processed_html_q
-            
-            full_html += html_a + HTML_TAIL
-            st.session_state.generated_result = {"full_html": full_html, "main_title": custom_main_title, "topic_title": work_name}
-            status.success("✅ 소설 분석 완료!"); st.session_state.generation_requested = False
-        except Exception as e: status.error(f"오류: {e}"); st.session_state.generation_requested = False
+        try:
+            raw_q, ans_parts = stream_questions_with_answers(p_q, build_answer_prompt, status_placeholder=status)
+        except BaseException:
+            chart_future.cancel()  # 문제지 실패 시 아직 시작 전인 차트 요청은 보내지 않음
+            raise
+        html_chart = clean_llm_html(chart_future.result().text)
+        html_q = re.sub(r'<h[12].*?>.*?</h[12]>', '', clean_llm_html(raw_q), flags=re.DOTALL | re.IGNORECASE)
+        html_a = '<div class="answer-sheet">' + "".join(ans_parts) + '</div>'
+    else:
+        res_q = generate_content_with_fallback(p_q, status_placeholder=status)
+        html_q = res_q.text.replace("```html","").replace("```","").strip()
+        html_q = re.sub(r'<h[12].*?>.*?</h[12]>', '', html_q, flags=re.DOTALL | re.IGNORECASE)
+
+        p_a = "위 8~9번 문항들에 대해 교사용 완벽 정답 및 상세 해설을 <div class='answer-sheet'> 내부에 작성하시오.\n문제 내용: " + html_q
+        res_a = generate_content_with_fallback(p_a, status_placeholder=status)
+        html_a = res_a.text.replace("```html","").replace("```","").strip()
+    index_generated_questions(html_q, "운문", hashlib.sha1(text.encode("utf-8")).hexdigest(), topic=work_name, genre=genre)
+    
+    full_html = HTML_HEAD + get_custom_header_html(main_title, work_name)
+    
+    # [지문 출력 완벽 제어]
+    processed_html_q = html_q
+    if not show_passage:
+        processed_html_q = re.sub(r'<div[^>]*class=["\']poetry-passage["\'][^>]*>.*?</div>', '', html_q, flags=re.DOTALL | re.IGNORECASE)
+        full_html += processed_html_q
+    else:
+        full_html += f'<div class="poetry-passage">{text}</div>' + processed_html_q
+    
+    full_html += html_chart + html_a + HTML_TAIL
+    sections = {"mode": "운문", "passage": text, "chart": html_chart, "questions": html_q, "answers": html_a}
+    return {"full_html": full_html, "main_title": main_title, "topic_title": work_name, "sections": sections}
 
 # ==========================================
 # 🌸 3. 운문 분석 차트형 분석 및 고난도 문항 제작
@@ -680,72 +1822,10 @@ def poetry_app():
         if not text: st.warning("운문 본문을 입력하세요."); st.session_state.generation_requested = False; return
         status = st.empty(); status.info("⚡ 운문 분석 중...")
         try:
-            # [복구] 어휘 풀이 행 동적 생성
-            vocab_row = ""
-            if ct_vocab_analysis:
-                vocab_row = "  <tr><th>7. 주요 어휘 및 구절 풀이</th><td>(지문 속 중요 어휘나 난해한 구절을 상세히 풀이)</td></tr>"
-
-            # [원본 유지] 분석 차트 프롬프트
-            p_chart = """
-당신은 수능 국어 강사입니다. 운문 작품 '{W_N}'({A_N}, 갈래: {G_N})를 분석하여 아래 HTML 차트를 제작하시오.
-[포맷 지침]: 반드시 아래 HTML 구조를 엄격히 지켜서 출력할 것.
-1. 사용자가 설정한 갈래인 '{G_N}'의 특성을 정확히 반영하여 분석하시오.
-2. 각 항목의 내용은 1), 2), 3) 과 같은 순서 표시를 사용하여 요점 위주로 작성하시오.
-3. 내용이 길어질 경우 적절한 줄바꿈을 포함하여 가독성을 높이시오.
-4. 제목 칸(th)의 너비는 120px로 고정되도록 디자인 지침을 따르시오.
-
-<div class="analysis-title">운문 분석 : {W_N} ({G_N})</div>
-<table class="analysis-chart">
-  <tr><th>1. 작품 개요</th><td>(갈래 {G_N}의 형식적 특징, 성격, 주제 등을 상세히 기술)</td></tr>
-  <tr><th>2. 핵심 내용 정리</th><td>(시상 전개 과정 및 핵심 상황 요약)</td></tr>
-  <tr><th>3. 주요 소재의 상징성</th><td>(주요 시어 및 비유적 소재의 의미 분석)</td></tr>
-  <tr><th>4. 표현상의 특징</th><td>(사용된 수사법, 심상, 어조, {G_N} 특유의 율격 특징)</td></tr>
-  <tr><th>5. 작품의 이해와 감상</th><td>(작품의 문학적 가치와 종합적 감상평)</td></tr>
-  <tr><th>6. 수능의 키포인트</th><td>(이 작품에서 수능 고난도 킬러 문항으로 출제될 수 있는 포인트)</td></tr>
-{V_ROW}
-</table>
-본문: {BODY}
-            """.format(W_N=po_n, A_N=po_a, G_N=po_genre, BODY=text, V_ROW=vocab_row)
-            
-            res_chart = generate_content_with_fallback(p_chart, status_placeholder=status)
-            html_chart = res_chart.text.replace("```html","").replace("```","").strip()
-
-            # [원본 유지] 문제 생성 프롬프트
-            r_list = []
-            if ct8: r_list.append("문항 8. 수능형 선지 OX 판단 (" + str(nt8) + "개) - 질문 끝에 ( ) 빈칸 출력. 각 문항 뒤 <br><br> 필수.")
-            if ct9: r_list.append("문항 9. 고난도 수능형 서술형 (" + str(nt9) + "개) - 각 문항 뒤 <br><br> 필수.")
-            r_str = "\n".join(r_list)
-            
-            p_q = """
-당신은 수능 국어 출제 위원장입니다. 운문 작품 '{W_N}'(갈래: {G_N})를 바탕으로 학생용 문제지(HTML)를 제작하시오.
-[중요 지침]: 
-1. {G_N}의 장르적 특성을 고려하여 실제 수능형 문제를 출제하시오. 
-2. 출력 시 반드시 아래의 HTML 구조를 따를 것: 각 문항은 question-box 클래스를 사용하고 문항 끝에는 <br><br>을 삽입하시오.
-3. 시 본문은 이미 출력했으므로 **HTML 응답에 절대 시 본문을 포함하지 마시오.** 출제 요청:
-{REQS}
-본문: {BODY}
-            """.format(W_N=po_n, G_N=po_genre, REQS=r_str, BODY=text)
-            
-            res_q = generate_content_with_fallback(p_q, status_placeholder=status)
-            html_q = res_q.text.replace("```html","").replace("```","").strip()
-            html_q = re.sub(r'<h[12].*?>.*?</h[12]>', '', html_q, flags=re.DOTALL | re.IGNORECASE)
-
-            p_a = "위 8~9번 문항들에 대해 교사용 완벽 정답 및 상세 해설을 <div class='answer-sheet'> 내부에 작성하시오.\n문제 내용: " + html_q
-            res_a = generate_content_with_fallback(p_a, status_placeholder=status)
-            html_a = res_a.text.replace("```html","").replace("```","").strip()
-            
-            full_html = HTML_HEAD + get_custom_header_html(c_title, po_n)
-            
-            # [지문 출력 완벽 제어]
-            processed_html_q = html_q
-            if not show_passage:
-                processed_html_q = re.sub(r'<div[^>]*class=["\']poetry-passage["\'][^>]*>.*?</div>', '', html_q, flags=re.DOTALL | re.IGNORECASE)
-                full_html += processed_html_q
-            else:
-                full_html += f'<div class="poetry-passage">{text}</div>' + processed_html_q
-            
-            full_html += html_chart + html_a + HTML_TAIL
-            st.session_state.generated_result = {"full_html": full_html, "main_title": c_title, "topic_title": po_n}
+            publish_generated_result(run_poetry_pipeline(
+                c_title, po_n, po_a, po_genre, text, nt8, nt9, vocab_analysis=ct_vocab_analysis, show_passage=show_passage,
+                pipelined=st.session_state.get("pipelined_answers", False), status=status
+            ))
             status.success("✅ 운문 분석 완료!"); st.session_state.generation_requested = False
         except Exception as e: status.error(f"오류: {e}"); st.session_state.generation_requested = False
 
@@ -755,16 +1835,37 @@ def poetry_app():
 def display_results():
     if st.session_state.generated_result:
         res = st.session_state.generated_result
+        if not result_artifacts_exist(res):
+            # 보관 기간/용량 정리로 삭제된 결과
+            st.session_state.generated_result = None
+            st.info("이전 생성 결과가 보관 기간이 지나 정리되었습니다. 다시 생성해주세요.")
+            return
         st.markdown("---")
+        history = [h for h in st.session_state.result_history if result_artifacts_exist(h)]
+        if len(history) > 1:
+            labels = [f'{time.strftime("%H:%M:%S", time.localtime(h["created_at"]))} · {h["topic_title"]}' for h in history]
+            current_idx = next((i for i, h in enumerate(history) if h["html"] == res["html"]), 0)
+            picked = st.selectbox("📂 최근 생성 기록", range(len(history)), index=current_idx, format_func=lambda i: labels[i], key="history_select")
+            res = history[picked]; st.session_state.generated_result = res
+        try:
+            html_text = read_artifact(res["html"], "html").decode("utf-8")
+        except FileNotFoundError:
+            # 존재 확인 직후 다른 세션의 용량 정리로 삭제된 경우
+            st.session_state.generated_result = None
+            st.info("이전 생성 결과가 보관 기간이 지나 정리되었습니다. 다시 생성해주세요.")
+            return
         c1, c2, c3 = st.columns(3)
         with c1:
             if st.button("🔄 다시 생성"):
                 st.session_state.generated_result = None; st.session_state.generation_requested = True; st.rerun()
-        with c2: st.download_button("📥 HTML 저장", res["full_html"], "exam.html", "text/html")
+        # 다운로드는 클릭 시점에 저장소 파일을 읽어 전달 (재실행마다 본문을 메모리에 올리지 않음)
+        # 클릭 후 재실행되므로 그 사이 파일이 정리되었으면 위의 정리 안내가 표시됨
+        with c2:
+            st.download_button("📥 HTML 저장", artifact_download(res["html"], "html"), "exam.html", "text/html")
         with c3:
-            docx = create_docx(res["full_html"], "exam.docx", res["main_title"], res["topic_title"])
-            st.download_button("📄 Word 저장", docx, "exam.docx")
-        st.components.v1.html(res["full_html"], height=800, scrolling=True)
+            st.download_button("📄 Word 저장", artifact_download(res["docx"], "docx"), "exam.docx",
+                               "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        st.components.v1.html(html_text, height=800, scrolling=True)
 
 st.title("📚 사계국어 모의고사 제작 시스템")
 st.markdown("---")
@@ -772,6 +1873,8 @@ col_L, col_R = st.columns([1.5, 3])
 
 with col_L:
     st.radio("모드 선택", ["⚡ 비문학 문제 제작", "📖 소설 문제 제작", "🌸 운문 문제 제작"], key="app_mode")
+    # [신규] 문제지 생성 중 완성된 문항부터 해설을 동시에 요청 (대량 출제 시 총 소요 시간 단축)
+    st.checkbox("⚡ 문제·해설 동시 생성 (파이프라인)", value=False, key="pipelined_answers")
 
 with col_R:
     if st.session_state.app_mode == "⚡ 비문학 문제 제작":
@@ -0,0 +1,127 @@
+# ==========================================
+# 📊 오프라인 부하 벤치마크
+# - 모의 LLM 프로바이더(MockProvider)로 비문학/소설/운문 파이프라인을 N개 동시 세션으로 실행
+# - 시험지 1부당 end-to-end 지연(p50/p95), LLM 호출 수, 토큰 수를 출력
+# - 네트워크/API 키 없이 실행 가능
+#
+# 사용 예:
+#   python benchmark.py --sessions 8 --rounds 3
+#   python benchmark.py --modes nf --latency-ms 1500 --failure-rate 0.05 --rate-limit-rate 0.1
+#   python benchmark.py --pipelined --ms-per-token 2  # 문제 스트리밍 중 해설 동시 생성 (출력 길이 비례 지연과 함께 비교)
+#   python benchmark.py --cassette recorded.jsonl   # live 모드에서 EXAM_LLM_CASSETTE로 기록한 응답 재생
+# ==========================================
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLE_TOPICS = [("금리 인하", "사회"), ("양자 얽힘", "과학"), ("공리주의", "인문"), ("블록체인 합의 알고리즘", "기술"), ("인상주의 회화", "예술")]
+
+SAMPLE_NOVEL = """그해 겨울은 유난히 길었다. 아버지는 새벽마다 장터로 나갔고, 어머니는 말없이 아궁이에 불을 지폈다.
+"올해도 빚을 갚기는 틀렸구먼." 아버지의 목소리는 낮았지만 방 안의 모두가 들을 수 있었다.
+나는 이불 속에서 숨을 죽인 채, 창호지 너머로 스며드는 희미한 빛을 바라보았다."""
+
+SAMPLE_POEM = """산에는 꽃 피네
+꽃이 피네
+갈 봄 여름 없이
+꽃이 피네"""
+
+NF_Q_COUNTS = {"t1": 1, "t2": 0, "t3": 0, "t4": 0, "t5": 2, "t6": 2, "t7": 1}  # 사이드바 기본값과 동일
+FICTION_Q_COUNTS = {"fv": 5, "fe": 3, "fm": 3, "fb": 2, "f5": 0, "f6": 0, "f7": 0, "f8": 0}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="모의 LLM 기반 모의고사 생성 파이프라인 부하 벤치마크")
+    parser.add_argument("--sessions", type=int, default=4, help="동시 세션 수")
+    parser.add_argument("--rounds", type=int, default=2, help="세션당 생성할 시험지 수")
+    parser.add_argument("--modes", default="nf,fiction,poetry", help="실행할 파이프라인 (nf, fiction, poetry)")
+    parser.add_argument("--latency-ms", type=float, default=800, help="모의 응답 지연 중앙값 (ms)")
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="출력 토큰당 추가 생성 시간 (ms)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="로그정규 지연 분포의 sigma")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="일반 실패 비율")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429 응답 비율")
+    parser.add_argument("--cassette", default="", help="재생할 카세트(JSONL) 경로")
+    parser.add_argument("--strict-cassette", action="store_true", help="카세트에 없는 프롬프트는 합성하지 않고 실패 처리")
+    parser.add_argument("--seed", type=int, default=None, help="모의 프로바이더 난수 시드")
+    parser.add_argument("--pipelined", action="store_true", help="문제 스트리밍 중 해설 동시 생성 모드로 실행")
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    # nearest-rank 방식: 값의 pct% 이상이 그 값 이하가 되는 가장 작은 순위
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def run_one(app, mode, idx, pipelined=False):
+    usage = app.start_llm_usage_tracking()
+    t0 = time.perf_counter()
+    error = None
+    try:
+        if mode == "nf":
+            topic, domain = SAMPLE_TOPICS[idx % len(SAMPLE_TOPICS)]
+            app.run_non_fiction_pipeline("벤치마크", "AI 생성", f"{topic} #{idx}", domain, "최상", NF_Q_COUNTS,
+                                         "1. 핵심 주장 요약 (서술형)", reuse_passage=False, pipelined=pipelined)
+        elif mode == "fiction":
+            app.run_fiction_pipeline("벤치마크", f"모의 소설 #{idx}", "작가", SAMPLE_NOVEL, FICTION_Q_COUNTS, pipelined=pipelined)
+        else:
+            app.run_poetry_pipeline("벤치마크", f"모의 시 #{idx}", "작가", "현대시", SAMPLE_POEM, 10, 3, pipelined=pipelined)
+    except Exception as e:
+        error = e
+    return {"mode": mode, "seconds": time.perf_counter() - t0, "error": error, **usage}
+
+
+def main():
+    args = parse_args()
+    # app.py import 전에 모의 프로바이더/임시 저장소를 지정 (실제 지문 뱅크·문제 은행 오염 방지)
+    os.environ["EXAM_LLM_PROVIDER"] = "mock"
+    os.environ.setdefault("EXAM_DATA_DIR", tempfile.mkdtemp(prefix="exam_bench_"))
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import streamlit.logger
+    # bare 모드(streamlit run 없이 import) 실행 시 위젯마다 출력되는 ScriptRunContext 경고 숨김
+    streamlit.logger.get_logger("streamlit.runtime.scriptrunner_utils.script_run_context").disabled = True
+    import app
+
+    provider = app.MockProvider(
+        cassette_path=args.cassette, latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+        failure_rate=args.failure_rate, rate_limit_rate=args.rate_limit_rate, ms_per_token=args.ms_per_token,
+        strict_cassette=args.strict_cassette, seed=args.seed,
+    )
+    app.set_llm_provider(provider)
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    print(f"세션 {args.sessions}개 × {args.rounds}회, 지연 중앙값 {args.latency_ms:.0f}ms, "
+          f"실패율 {args.failure_rate:.0%}, 429 비율 {args.rate_limit_rate:.0%}" + (", 파이프라인 모드" if args.pipelined else ""))
+    print(f"{'mode':<8} {'exams':>5} {'errors':>6} {'p50(s)':>8} {'p95(s)':>8} {'calls/exam':>10} {'retries/exam':>12} {'tokens/exam':>11} {'wall(s)':>8}")
+    for mode in modes:
+        jobs = range(args.sessions * args.rounds)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+            # 세션마다 독립된 호출 집계를 갖도록 컨텍스트를 분리해서 실행
+            results = list(executor.map(lambda i: contextvars.copy_context().run(run_one, app, mode, i, args.pipelined), jobs))
+        wall = time.perf_counter() - t0
+        ok = [r for r in results if r["error"] is None]
+        lat = [r["seconds"] for r in ok]
+        n = max(1, len(ok))
+        print(f"{mode:<8} {len(results):>5} {len(results) - len(ok):>6} {percentile(lat, 50):>8.2f} {percentile(lat, 95):>8.2f} "
+              f"{sum(r['calls'] for r in ok) / n:>10.1f} {sum(r['failures'] for r in ok) / n:>12.1f} "
+              f"{sum(r['prompt_tokens'] + r['completion_tokens'] for r in ok) / n:>11.0f} {wall:>8.2f}")
+        for r in results:
+            if r["error"] is not None:
+                print(f"  ! {mode} 실패: {r['error']}")
+    if args.cassette:
+        # 누락된 프롬프트는 합성 응답으로 대체되므로, 재생 회귀 테스트로 쓸 때는 누락 0 또는 --strict-cassette 확인
+        print(f"카세트 재생: 적중 {provider.cassette_hits}회, 누락 {provider.cassette_misses}회")
+        if args.strict_cassette and provider.cassette_misses:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py는 import 시점에 저장 경로/프로바이더를 읽으므로 먼저 오프라인 설정을 지정 (benchmark.py와 동일)
+os.environ["EXAM_LLM_PROVIDER"] = "mock"
+os.environ.setdefault("EXAM_DATA_DIR", tempfile.mkdtemp(prefix="exam_test_"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit.logger  # noqa: E402
+
+# bare 모드(streamlit run 없이 import) 실행 시 위젯마다 출력되는 ScriptRunContext 경고 숨김
+streamlit.logger.get_logger("streamlit.runtime.scriptrunner_utils.script_run_context").disabled = True
+
+import app as exam_app  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    return exam_app
+
+
+@pytest.fixture
+def data_dir(app, tmp_path, monkeypatch):
+    """테스트마다 빈 지문 뱅크/문제 은행/아티팩트 저장소를 사용."""
+    monkeypatch.setattr(app, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(app, "BANK_DB_PATH", str(tmp_path / "exam_bank.db"))
+    monkeypatch.setattr(app, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+    return tmp_path
@@ -0,0 +1,105 @@
+# 해설 파이프라인: 스트리밍 문제지 묶음 분할과 묶음별 해설 병렬 요청
+
+import threading
+import time
+
+import pytest
+
+from app import LLMResponse
+
+MCQ = ('<div class="question-box"><span class="question-text">{n}. 윗글을 바탕으로 추론한 내용으로 적절하지 않은 것은?</span>'
+       '<div class="choices"><div>① 가설은 검증되었다.</div><div>② 반례가 있다.</div><div>③ 전제가 틀렸다.</div>'
+       '<div>④ 결론이 과장되었다.</div><div>⑤ 근거가 부족하다.</div></div></div><br><br>\n')
+
+
+def make_sheet(sections):
+    out = []; n = 1
+    for title, count in sections:
+        out.append(f"<h3>{title} ({count}문항)</h3>\n")
+        for _ in range(count):
+            out.append(MCQ.format(n=n)); n += 1
+    return "".join(out)
+
+
+def feed(app, text, chunk):
+    """스트리밍처럼 chunk 글자씩 누적하며 묶음을 잘라내고, 마지막에 final로 나머지를 처리."""
+    buffer = ""; consumed = 0; groups = []
+    for i in range(0, len(text), chunk):
+        buffer += text[i:i + chunk]
+        new, used = app.split_complete_groups(buffer[consumed:])
+        groups += new; consumed += used
+    new, used = app.split_complete_groups(buffer[consumed:], final=True)
+    return groups + new
+
+
+def test_open_question_box_is_not_cut(app):
+    partial = "<h3>객관식: 추론 및 비판 (2문항)</h3>" + MCQ.format(n=1) + MCQ.format(n=2)[:80]
+    assert app.split_complete_groups(partial) == ([], 0)
+
+
+def test_groups_split_at_h3_and_max_boxes(app):
+    sheet = make_sheet([("객관식: 세부 내용 파악", 8), ("객관식: [보기] 적용 문제", 2)])
+    groups = feed(app, sheet, len(sheet))
+    assert [g.count('class="question-box"') for g in groups] == [6, 2, 2]
+    assert groups[2].startswith("<h3>객관식: [보기] 적용 문제")
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 64, 500])
+def test_chunking_does_not_change_groups(app, chunk):
+    sheet = "```html\n" + make_sheet([("내용 일치 O/X", 3), ("객관식: 추론 및 비판", 7)]) + "```"
+    whole = feed(app, sheet, len(sheet))
+    assert feed(app, sheet, chunk) == whole
+    assert sum(g.count('class="question-box"') for g in whole) == 10
+
+
+class StreamingProvider:
+    """문제지를 조각으로 스트리밍하고, 해설 요청은 지연 후 응답하는 테스트용 프로바이더."""
+
+    def __init__(self, sheet, answer_delay=0.05, fail_after=None):
+        self.sheet = sheet; self.answer_delay = answer_delay; self.fail_after = fail_after
+        self.lock = threading.Lock(); self.in_flight = 0; self.peak = 0; self.answer_calls = 0
+
+    def supports(self, model_name):
+        return True
+
+    def stream(self, model_name, prompt, generation_config=None):
+        for i in range(0, len(self.sheet), 200):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise RuntimeError("stream dropped")
+            yield self.sheet[i:i + 200]
+
+    def generate(self, model_name, prompt, generation_config=None):
+        with self.lock:
+            self.in_flight += 1; self.peak = max(self.peak, self.in_flight); self.answer_calls += 1
+        try:
+            time.sleep(self.answer_delay)
+            return LLMResponse(f"<div>해설 {prompt.split('|')[0]}</div>", 1, 1)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def provider(app, monkeypatch):
+    def install(p):
+        monkeypatch.setattr(app, "llm_provider", p)
+        return p
+    return install
+
+
+def test_answers_returned_in_group_order_with_cap(app, provider):
+    sheet = make_sheet([("객관식: 세부 내용 파악", 6), ("객관식: 추론 및 비판", 6), ("내용 일치 O/X", 6), ("객관식: [보기] 적용 문제", 6)])
+    p = provider(StreamingProvider(sheet))
+    raw, answers = app.stream_questions_with_answers("문제지", lambda group, idx: f"{idx}|{group}")
+    assert raw == sheet
+    assert answers == [f"<div>해설 {i}</div>" for i in range(4)]
+    assert p.peak <= app.ANSWER_MAX_IN_FLIGHT_PER_REQUEST
+
+
+def test_stream_failure_raises_without_waiting_for_answers(app, provider):
+    sheet = make_sheet([("객관식: 세부 내용 파악", 6), ("객관식: 추론 및 비판", 6), ("내용 일치 O/X", 6)])
+    provider(StreamingProvider(sheet, answer_delay=2.0, fail_after=len(sheet) // 2))
+    started = time.perf_counter()
+    with pytest.raises(RuntimeError, match="stream dropped"):
+        app.stream_questions_with_answers("문제지", lambda group, idx: f"{idx}|{group}")
+    assert time.perf_counter() - started < 1.0
@@ -0,0 +1,66 @@
+# 아티팩트 저장소: 내용 해시 저장과 보관 기간/용량 정리
+
+import os
+import time
+
+import pytest
+
+
+def age(app, digest, ext, days):
+    path = app.artifact_path(digest, ext)
+    stamp = time.time() - days * 86400
+    os.utime(path, (stamp, stamp))
+
+
+def test_same_content_is_stored_once(app, data_dir):
+    first = app.put_artifact(b"<html>exam</html>", "html")
+    second = app.put_artifact(b"<html>exam</html>", "html")
+    assert first == second
+    assert sum(len(files) for _, _, files in os.walk(app.ARTIFACT_DIR)) == 1
+
+
+def test_put_artifact_rewrites_file_removed_by_cleanup(app, data_dir, monkeypatch):
+    digest = app.put_artifact(b"docx bytes", "docx")
+    os.remove(app.artifact_path(digest, "docx"))
+    monkeypatch.setattr(app.os.path, "exists", lambda path: True)  # 존재 확인 직후 삭제된 상황
+    assert app.put_artifact(b"docx bytes", "docx") == digest
+    assert app.read_artifact(digest, "docx") == b"docx bytes"
+
+
+def test_cleanup_removes_expired_files_only(app, data_dir):
+    old = app.put_artifact(b"old exam", "html")
+    new = app.put_artifact(b"new exam", "html")
+    age(app, old, "html", 40)
+    assert app.cleanup_artifacts(max_bytes=10 ** 9, max_age_days=30) == 1
+    assert not app.artifact_exists(old, "html")
+    assert app.artifact_exists(new, "html")
+
+
+def test_cleanup_trims_oldest_until_under_size_limit(app, data_dir):
+    digests = [app.put_artifact(bytes([i]) * 100, "docx") for i in range(4)]
+    for days, digest in zip([4, 3, 2, 1], digests):
+        age(app, digest, "docx", days)
+    assert app.cleanup_artifacts(max_bytes=250, max_age_days=30) == 2
+    assert [app.artifact_exists(d, "docx") for d in digests] == [False, False, True, True]
+
+
+def test_cleanup_ignores_in_progress_temp_files(app, data_dir):
+    digest = app.put_artifact(b"exam", "html")
+    tmp_path = app.artifact_path(digest, "html") + ".123.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"x" * 1000)
+    assert app.cleanup_artifacts(max_bytes=0, max_age_days=30) == 1
+    assert os.path.exists(tmp_path)
+
+
+def test_cleanup_on_missing_store_is_noop(app, data_dir):
+    assert app.cleanup_artifacts() == 0
+
+
+def test_deferred_download_fails_instead_of_serving_empty_file(app, data_dir):
+    digest = app.put_artifact(b"exam", "html")
+    load = app.artifact_download(digest, "html")
+    assert load() == b"exam"
+    os.remove(app.artifact_path(digest, "html"))
+    with pytest.raises(FileNotFoundError):
+        load()
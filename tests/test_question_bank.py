@@ -0,0 +1,85 @@
+# 문제 은행: 실제 LLM 응답 형태의 문제지 분할 및 유사 문항 판별
+
+NF_SHEET = """```html
+<div class="question-box"><span class="question-text">1. 1. 핵심 주장 요약 (서술형)</span><div class="write-box"></div></div><br><br>
+
+<h3>내용 일치 O/X (2문항)</h3>
+2. 기준금리 인하는 가계의 이자 부담을 줄여 소비를 증가시킨다고 필자는 본다. ( O / X )<br><br>
+3. 중앙은행은 물가 안정을 위해 기준금리를 항상 인상해야 한다고 주장한다. ( O / X )<br><br>
+
+<h3>객관식: 세부 내용 파악 (1문항)</h3>
+<div class="question-box">
+  <span class="question-text">4. 윗글의 내용과 일치하지 않는 것은?</span>
+  <div class="choices">
+    <div>① 금리 인하는 자산 가격을 상승시킬 수 있다.</div>
+    <div>② 금리 인하는 환율에 영향을 주지 않는다.</div>
+    <div>③ 유동성이 늘면 물가 상승 압력이 커진다.</div>
+    <div>④ 가계 부채가 많으면 금리 변화의 영향이 커진다.</div>
+    <div>⑤ 정책 효과는 시차를 두고 나타난다.</div>
+  </div>
+</div><br><br>
+```"""
+
+# 운문 문제지는 h3 없이 question-box만으로 출력됨 (프롬프트가 "문항 8." 목록으로 요청)
+POETRY_SHEET = """<div class="question-box"><span class="question-text">1. 화자는 계절의 순환 속에서 생명의 지속성을 긍정하고 있다. ( )</span></div><br><br>
+<div class="question-box"><span class="question-text">2. '갈 봄 여름 없이'라는 표현이 시의 주제 형성에 기여하는 바를 서술하시오.</span><div class="write-box"></div></div><br><br>"""
+
+
+def test_split_question_items_uses_h3_titles_as_types(app):
+    items = app.split_question_items(app.clean_llm_html(NF_SHEET), lead_type=None)
+    assert [t for t, _ in items] == ["내용 일치 O/X", "내용 일치 O/X", "객관식: 세부 내용 파악"]
+    assert "⑤ 정책 효과는" in items[2][1]  # 중첩된 choices div까지 한 문항으로 유지
+
+
+def test_split_question_items_skips_lead_template_only_when_requested(app):
+    sheet = app.clean_llm_html(NF_SHEET)
+    assert not any("핵심 주장 요약" in html for _, html in app.split_question_items(sheet, lead_type=None))
+    assert any("핵심 주장 요약" in html for _, html in app.split_question_items(sheet))
+
+
+def test_split_question_items_keeps_headerless_poetry_sheet(app):
+    items = app.split_question_items(POETRY_SHEET)
+    assert len(items) == 2
+    assert all(q_type == "" for q_type, _ in items)
+
+
+def test_index_poetry_sheet_is_found_by_genre(app, data_dir):
+    assert app.index_generated_questions(POETRY_SHEET, "운문", "poem-key", topic="꽃", genre="현대시") == 2
+    assert len(app.lookup_questions("운문", genre="현대시")) == 2
+
+
+def test_near_duplicate_detected_for_renumbered_item(app):
+    a = app.normalize_question_text("2. 기준금리 인하는 가계의 이자 부담을 줄여 소비를 증가시킨다고 필자는 본다. ( O / X )")
+    b = app.normalize_question_text("<span>7. 기준금리 인하는 가계의 이자 부담을 줄여 소비를 증가시킨다고 필자는 본다. (O/X)</span>")
+    assert a == b
+    assert set(app.minhash_band_hashes(app.make_shingles(a))) == set(app.minhash_band_hashes(app.make_shingles(b)))
+
+
+def test_unrelated_items_share_no_band(app):
+    a = app.make_shingles(app.normalize_question_text("기준금리 인하는 가계의 이자 부담을 줄여 소비를 증가시킨다."))
+    b = app.make_shingles(app.normalize_question_text("화자는 계절의 순환 속에서 생명의 지속성을 긍정하고 있다."))
+    assert app.jaccard(a, b) < app.QUESTION_DUP_THRESHOLD
+    assert not set(app.minhash_band_hashes(a)) & set(app.minhash_band_hashes(b))
+
+
+def test_reindexing_same_sheet_adds_nothing(app, data_dir):
+    sheet = app.clean_llm_html(NF_SHEET)
+    assert app.index_generated_questions(sheet, "비문학", "passage-a", lead_type=None) == 3
+    assert app.index_generated_questions(sheet, "비문학", "passage-a", lead_type=None) == 0
+
+
+def test_dedup_is_scoped_to_passage(app, data_dir):
+    # 한 단어만 다른 O/X 문항도 다른 지문의 것이면 그 지문용으로 따로 저장되어야 함
+    sheet = app.clean_llm_html(NF_SHEET)
+    app.index_generated_questions(sheet, "비문학", "passage-a", lead_type=None)
+    flipped = sheet.replace("증가시킨다", "감소시킨다")
+    assert app.index_generated_questions(flipped, "비문학", "passage-b", lead_type=None) == 3
+    built = app.build_sheet_from_bank("비문학", "passage-b", [("내용 일치 O/X", 2)])
+    assert "감소시킨다" in built and "증가시킨다" not in built
+
+
+def test_index_failure_is_not_raised(app, data_dir, monkeypatch):
+    def locked():
+        raise app.sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(app, "get_bank_connection", locked)
+    assert app.index_generated_questions(POETRY_SHEET, "운문", "poem-key") == 0